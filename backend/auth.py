@@ -1,4 +1,10 @@
+import asyncio
 import bcrypt
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 
@@ -6,6 +12,22 @@ SECRET_KEY = "coding-retriever-super-secret-key-2024-ai"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480  # 8 hours
 
+# bcrypt cost factor for new hashes; existing hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads hashing passwords; more concurrent logins wait in the pool's queue
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Validated tokens whose user is kept in memory (least recently used are evicted)
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "1024"))
+# Seconds a cached user is trusted; bounds staleness when several processes
+# serve the API, since invalidation only reaches the local cache
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+
+
+# bcrypt releases the GIL while hashing, so these threads run in parallel
+# without holding up the event loop or the request threadpool
+_hash_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
@@ -16,11 +38,36 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     # Salt is automatically generated
     pwd_bytes = password.encode('utf-8')
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(pwd_bytes, salt)
     return hashed.decode('utf-8')
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bcrypt thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bcrypt thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if a hash was made with a different cost factor than BCRYPT_ROUNDS."""
+    try:
+        # $2b$<rounds>$<salt and hash>
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+
+def shutdown_hashing():
+    _hash_executor.shutdown(wait=False, cancel_futures=True)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -38,3 +85,81 @@ def decode_access_token(token: str) -> dict:
         return payload
     except JWTError:
         return None
+
+
+class SessionCache:
+    """LRU cache of validated access tokens to a snapshot of their user's columns.
+
+    An entry expires at the token's exp or after ttl seconds, whichever comes
+    first, so a hit needs neither the JWT decode nor the user query. Routes
+    that change an account call invalidate_user.
+    """
+
+    def __init__(self, max_entries: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (expires_at, user_id, values)
+        self._tokens_by_user = {}  # user_id -> set of cached tokens
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    self._forget(token)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, token: str, exp, values: dict):
+        if not self.max_entries:
+            return
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        user_id = values["id"]
+        with self._lock:
+            if token in self._entries:
+                self._forget(token)
+            self._entries[token] = (expires_at, user_id, values)
+            self._tokens_by_user.setdefault(user_id, set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _forget(self, token: str):
+        """Drop one entry. Caller holds the lock."""
+        _, user_id, _ = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._forget(token)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+session_cache = SessionCache()
@@ -0,0 +1,145 @@
+"""Measure export time-to-first-byte, total time and peak memory.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_export --rows 100000
+
+A throwaway SQLite database is filled with the given number of students and
+exported as streamed xlsx and csv, and with the previous approach (ORM
+objects into an in-memory Workbook) for comparison. Each mode runs in its own
+process so peak RSS is measured separately.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("legacy", "xlsx", "csv")
+
+
+def legacy_export(db, criteria):
+    """The export as it was before streaming: every row built in memory first."""
+    import openpyxl
+
+    from export import EXPORT_HEADERS
+    from models import Student
+
+    students = db.query(Student).filter(*criteria).order_by(Student.roll_number).all()
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(EXPORT_HEADERS)
+    for idx, s in enumerate(students, 1):
+        ws.append([
+            idx, s.name, s.roll_number, s.leetcode_solved, s.hr_java_stars, s.hr_python_stars,
+            s.hr_c_stars, s.hr_sql_stars, s.leetcode_url, s.hackerrank_url,
+        ])
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    yield output.getvalue()
+
+
+def run_one(mode: str, rows: int) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="bench_export_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    from database import SessionLocal
+    from export import stream_export
+    from migrations import upgrade
+    from models import Student, User
+    from queries import student_filters
+
+    upgrade()
+    db = SessionLocal()
+    user = User(username="bench", password_hash="-")
+    db.add(user)
+    db.commit()
+    for start in range(0, rows, 5000):
+        db.bulk_insert_mappings(Student, [
+            {
+                "name": f"Student {i}",
+                "roll_number": f"21BCE{i:06d}",
+                "leetcode_url": f"https://leetcode.com/u/student{i}/",
+                "hackerrank_url": f"https://www.hackerrank.com/profile/student{i}",
+                "category": "1st_year",
+                "uploaded_by": user.id,
+                "leetcode_solved": i % 700,
+                "hr_java_stars": i % 6,
+                "hr_python_stars": (i + 1) % 6,
+                "hr_c_stars": (i + 2) % 6,
+                "hr_sql_stars": (i + 3) % 6,
+            }
+            for i in range(start, min(rows, start + 5000))
+        ])
+    db.commit()
+    criteria = student_filters(user.id, "1st_year")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    started = time.perf_counter()
+    chunks = legacy_export(db, criteria) if mode == "legacy" else stream_export(mode, criteria, "1st_year")
+    first_byte = None
+    size = 0
+    for chunk in chunks:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    db.close()
+
+    return {
+        "mode": mode,
+        "rows": rows,
+        "bytes": size,
+        "time_to_first_byte": round(first_byte, 3),
+        "seconds": round(elapsed, 3),
+        "peak_python_mb": round(traced_peak / 1024 / 1024, 1),
+        "peak_rss_growth_mb": round((rss_after - rss_before) / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated list")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_one(args.single, args.rows)))
+        return
+
+    results = []
+    for mode in args.modes.split(","):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_export", "--rows", str(args.rows), "--single", mode],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{mode}: failed\n{proc.stderr.strip()}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'mode':<8} {'rows':>8} {'TTFB s':>8} {'total s':>8} {'peak py MB':>11} {'RSS growth MB':>14}")
+    for r in results:
+        print(
+            f"{r['mode']:<8} {r['rows']:>8} {r['time_to_first_byte']:>8.2f} {r['seconds']:>8.2f}"
+            f" {r['peak_python_mb']:>11.1f} {r['peak_rss_growth_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Measure roster ingest throughput and peak memory per file format.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_ingest --rows 50000
+    python -m benchmarks.bench_ingest --rows 50000 --formats xlsx,csv,parquet
+
+A roster with the given number of rows is generated in a temporary
+directory for each format and ingested into a throwaway SQLite database.
+Every format runs in its own process so peak RSS is measured separately.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.rosters import write_roster
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_one(fmt: str, rows: int) -> dict:
+    """Ingest one generated roster in this process and return its measurements."""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_ingest_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    sys.path.insert(0, BACKEND_DIR)
+
+    from database import SessionLocal
+    from ingest import ingest_rows, reader_for
+    from migrations import upgrade
+    from models import User
+
+    path = os.path.join(tmp_dir, f"roster_{rows}.{fmt}")
+    write_roster(path, rows, fmt)
+
+    upgrade()
+    db = SessionLocal()
+    user = User(username="bench", password_hash="-")
+    db.add(user)
+    db.commit()
+
+    # Only the ingest itself counts towards the memory baseline comparison
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        report = ingest_rows(db, reader_for(path)(f), "1st_year", user.id)
+    db.commit()
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    db.close()
+
+    return {
+        "format": fmt,
+        "rows": report["count"],
+        "row_errors": report["error_count"],
+        "file_bytes": os.path.getsize(path),
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(report["count"] / elapsed),
+        "peak_rss_kb": rss_after,
+        "peak_rss_growth_kb": rss_after - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--formats", default="xlsx,csv,parquet", help="comma-separated list")
+    parser.add_argument("--single", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_one(args.single, args.rows)))
+        return
+
+    results = []
+    for fmt in args.formats.split(","):
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_ingest", "--rows", str(args.rows), "--single", fmt],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{fmt}: failed\n{proc.stderr.strip()}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"{'format':<8} {'rows':>8} {'seconds':>8} {'rows/sec':>10} {'peak RSS MB':>12} {'growth MB':>10}")
+    for r in results:
+        print(
+            f"{r['format']:<8} {r['rows']:>8} {r['seconds']:>8.2f} {r['rows_per_second']:>10,}"
+            f" {r['peak_rss_kb'] / 1024:>12.1f} {r['peak_rss_growth_kb'] / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Load test the read endpoints and compare against an earlier revision.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_load --duration 15 --concurrency 32
+    python -m benchmarks.bench_load --baseline HEAD~1
+
+The server is started under uvicorn against a throwaway SQLite database and
+a roster of --students students is uploaded. Concurrent clients then cycle
+through the student list (paged and sorted), the profile and the admin user
+list for --duration seconds. With --baseline, the backend directory of that
+git revision is exported to a temporary directory and measured the same way,
+so the two runs can be compared.
+"""
+import argparse
+import io
+import itertools
+import os
+import statistics
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+
+import openpyxl
+import requests
+
+from benchmarks.server import ADMIN, BACKEND_DIR, start_server, stop_server
+
+ENDPOINTS = (
+    "/api/students/2nd_year?limit=50",
+    "/api/students/2nd_year?limit=50&sort=leetcode_solved&order=desc",
+    "/api/profile",
+    "/api/admin/users",
+)
+
+
+def export_revision(revision: str) -> str:
+    """Extract backend/ as of a git revision and return its path."""
+    archive = subprocess.run(
+        ["git", "archive", "--format=tar", revision, "backend"],
+        cwd=os.path.dirname(BACKEND_DIR),
+        capture_output=True,
+        check=True,
+    ).stdout
+    target = tempfile.mkdtemp(prefix="bench_load_")
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target)
+    return os.path.join(target, "backend")
+
+
+def roster_xlsx(students: int) -> bytes:
+    """An .xlsx roster, the one format every revision's upload route accepts."""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Name", "Roll Number", "Leetcode Profile URL", "HackerRank URL"])
+    for i in range(students):
+        sheet.append([
+            f"Student {i}",
+            f"21BCE{i:06d}",
+            f"https://leetcode.com/u/student{i}/",
+            f"https://www.hackerrank.com/profile/student{i}",
+        ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def run_one(label: str, backend_dir: str, students: int, duration: float, concurrency: int) -> dict:
+    proc, base_url = start_server(backend_dir=backend_dir)
+    try:
+        token = requests.post(f"{base_url}/api/auth/login", json=ADMIN).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        requests.post(
+            f"{base_url}/api/upload/2nd_year",
+            headers=headers,
+            files={"file": ("roster.xlsx", roster_xlsx(students))},
+        ).raise_for_status()
+
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def client(offset: int):
+            nonlocal errors
+            with requests.Session() as session:
+                for path in itertools.islice(itertools.cycle(ENDPOINTS), offset, None):
+                    if time.perf_counter() >= deadline:
+                        return
+                    started = time.perf_counter()
+                    ok = session.get(f"{base_url}{path}", headers=headers).ok
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        errors += not ok
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        stop_server(proc)
+
+    return {
+        "label": label,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(statistics.quantiles(latencies, n=20)[18] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--baseline", help="git revision to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    targets = []
+    if args.baseline:
+        targets.append((args.baseline, export_revision(args.baseline)))
+    targets.append(("working tree", BACKEND_DIR))
+
+    results = [run_one(label, path, args.students, args.duration, args.concurrency) for label, path in targets]
+
+    print(f"{'target':<14} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for r in results:
+        print(
+            f"{r['label']:<14} {r['requests']:>9} {r['errors']:>7} {r['requests_per_second']:>8.1f}"
+            f" {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Measure login throughput and how much a login burst delays other requests.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_login --logins 200 --concurrency 20
+    python -m benchmarks.bench_login --rounds 10,12 --workers 1,4
+
+For every combination of bcrypt cost factor and hashing threads, a uvicorn
+server is started against a throwaway SQLite database. The benchmark then
+sends a burst of concurrent logins while polling /api/health, and reports
+logins per second, login latency and health-check latency during the burst.
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.server import ADMIN, start_server, stop_server
+
+
+def percentile(values: list, percent: int) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run_one(rounds: int, workers: int, logins: int, concurrency: int) -> dict:
+    proc, base_url = start_server({"BCRYPT_ROUNDS": str(rounds), "BCRYPT_WORKERS": str(workers)})
+    try:
+        session = requests.Session()
+        # Warm up, and rehash the admin password if the cost factor differs
+        session.post(f"{base_url}/api/auth/login", json=ADMIN).raise_for_status()
+
+        health_latencies = []
+        done = threading.Event()
+
+        def poll_health():
+            with requests.Session() as health:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    health.get(f"{base_url}/api/health")
+                    health_latencies.append(time.perf_counter() - started)
+                    time.sleep(0.01)
+
+        def login(_):
+            started = time.perf_counter()
+            requests.post(f"{base_url}/api/auth/login", json=ADMIN).raise_for_status()
+            return time.perf_counter() - started
+
+        poller = threading.Thread(target=poll_health)
+        poller.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(login, range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        poller.join()
+    finally:
+        stop_server(proc)
+
+    return {
+        "rounds": rounds,
+        "workers": workers,
+        "logins_per_second": round(logins / elapsed, 1),
+        "login_p50_ms": round(statistics.median(latencies) * 1000),
+        "login_p95_ms": round(percentile(latencies, 95) * 1000),
+        "health_p95_ms": round(percentile(health_latencies, 95) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rounds", default="12", help="comma-separated bcrypt cost factors")
+    parser.add_argument("--workers", default=str(min(4, os.cpu_count() or 1)), help="comma-separated thread counts")
+    args = parser.parse_args()
+
+    results = []
+    for rounds in map(int, args.rounds.split(",")):
+        for workers in map(int, args.workers.split(",")):
+            results.append(run_one(rounds, workers, args.logins, args.concurrency))
+
+    print(f"{'rounds':>6} {'workers':>7} {'logins/s':>9} {'p50 ms':>7} {'p95 ms':>7} {'health p95 ms':>14}")
+    for r in results:
+        print(
+            f"{r['rounds']:>6} {r['workers']:>7} {r['logins_per_second']:>9.1f} {r['login_p50_ms']:>7}"
+            f" {r['login_p95_ms']:>7} {r['health_p95_ms']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
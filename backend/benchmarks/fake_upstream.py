@@ -0,0 +1,149 @@
+"""Local stand-in for the LeetCode GraphQL and HackerRank badges endpoints.
+
+Point the scraper at it with
+
+    LEETCODE_GRAPHQL_URL=http://127.0.0.1:8765/graphql
+    HACKERRANK_BASE_URL=http://127.0.0.1:8765
+
+and run it from the backend directory:
+
+    python -m benchmarks.fake_upstream --port 8765 --latency 0.05 --error-rate 0.01 --throttle-rate 0.02
+
+Answers are derived from the username, so repeated runs see the same
+scores. Usernames starting with "missing" don't exist on either platform.
+A fraction of requests can be failed with a 500 or throttled with a 429
+and a Retry-After header; the failures are drawn from a seeded generator.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BADGES = ("Java", "Python", "C", "SQL")
+
+
+def solved_count(username: str) -> int:
+    return zlib.crc32(username.encode()) % 900
+
+
+def badge_stars(username: str) -> list:
+    seed = zlib.crc32(username.encode()[::-1])
+    return [{"badge_name": name, "stars": (seed >> (3 * i)) % 6} for i, name in enumerate(BADGES)]
+
+
+def matched_user(username: str):
+    if username.startswith("missing"):
+        return None
+    return {"submitStatsGlobal": {"acSubmissionNum": [{"difficulty": "All", "count": solved_count(username)}]}}
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    throttle_rate = 0.0
+    retry_after = 1
+    rng = random.Random(0)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _misbehave(self) -> bool:
+        """Delay the response, then maybe answer with a 429 or 500 instead."""
+        time.sleep(self.latency)
+        roll = self.rng.random()
+        if roll < self.throttle_rate:
+            payload = b'{"error": "rate limited"}'
+            self.send_response(429)
+            self.send_header("Retry-After", str(self.retry_after))
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return True
+        if roll < self.throttle_rate + self.error_rate:
+            self._send(500, {"error": "internal error"})
+            return True
+        return False
+
+    def _send(self, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self._misbehave():
+            return
+        if self.path != "/graphql":
+            return self._send(404, {})
+        variables = body.get("variables") or {}
+        if "username" in variables:
+            return self._send(200, {"data": {"matchedUser": matched_user(variables["username"])}})
+        # Batched lookups alias one matchedUser selection per variable
+        return self._send(200, {"data": {alias: matched_user(name) for alias, name in variables.items()}})
+
+    def do_GET(self):
+        if self._misbehave():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) != 4 or parts[:2] != ["rest", "hackers"] or parts[3] != "badges":
+            return self._send(404, {})
+        username = parts[2]
+        if username.startswith("missing"):
+            return self._send(404, {"error": "not found"})
+        return self._send(200, {"models": badge_stars(username)})
+
+
+def make_server(
+    port: int = 0,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    throttle_rate: float = 0.0,
+    retry_after: int = 1,
+    seed: int = 0,
+) -> ThreadingHTTPServer:
+    handler = type(
+        "Handler",
+        (FakeUpstreamHandler,),
+        {
+            "latency": latency,
+            "error_rate": error_rate,
+            "throttle_rate": throttle_rate,
+            "retry_after": retry_after,
+            "rng": random.Random(seed),
+        },
+    )
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def start_fake_upstream(**options):
+    """Serve in a background thread and return (server, base_url); options as for make_server."""
+    server = make_server(**options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(
+        args.port, args.latency, args.error_rate, args.throttle_rate, args.retry_after, args.seed
+    )
+    print(f"Fake upstream on http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Generated rosters for the benchmarks.
+
+Handles are derived from the row number. Every MISSING_EVERY-th student has
+handles the fake upstream reports as not found, and every
+SHARED_HANDLE_EVERY-th student reuses the previous student's handles, as
+happens with real rosters.
+"""
+import csv
+import os
+import tempfile
+
+HEADER = ["Name", "Roll Number", "Leetcode Profile URL", "HackerRank URL"]
+MISSING_EVERY = 50
+SHARED_HANDLE_EVERY = 20
+# Generated workbooks are kept here between runs
+DATA_DIR = os.path.join(tempfile.gettempdir(), "coding_retriever_rosters")
+
+
+def handle(i: int) -> str:
+    if i % SHARED_HANDLE_EVERY == SHARED_HANDLE_EVERY - 1:
+        i -= 1
+    return f"missing{i}" if i % MISSING_EVERY == MISSING_EVERY - 1 else f"student{i}"
+
+
+def roster_rows(rows: int):
+    for i in range(rows):
+        name = handle(i)
+        yield [
+            f"Student {i}",
+            f"21BCE{i:06d}",
+            f"https://leetcode.com/u/{name}/",
+            f"https://www.hackerrank.com/profile/{name}",
+        ]
+
+
+def write_roster(path: str, rows: int, fmt: str):
+    if fmt == "xlsx":
+        import openpyxl
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(HEADER)
+        for row in roster_rows(rows):
+            sheet.append(row)
+        workbook.save(path)
+    elif fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(roster_rows(rows))
+    elif fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = list(zip(*roster_rows(rows)))
+        pq.write_table(pa.table({name: list(col) for name, col in zip(HEADER, columns)}), path)
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def roster_path(rows: int, fmt: str = "xlsx", data_dir: str = DATA_DIR) -> str:
+    """Path of a generated roster, writing it on first use."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"roster_{rows}.{fmt}")
+    if not os.path.exists(path):
+        partial = f"{path}.partial"
+        write_roster(partial, rows, fmt)
+        os.replace(partial, path)
+    return path
+
+
+if __name__ == "__main__":
+    # python -m benchmarks.rosters  pre-generates the standard sizes
+    for size in (1000, 10000, 100000):
+        print(roster_path(size))
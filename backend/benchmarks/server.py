@@ -0,0 +1,46 @@
+"""Start the API under uvicorn against a throwaway SQLite database for benchmarks."""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN = {"username": "Admin@AI", "password": "AI@Artificial_Intelligence"}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(env: dict = None, backend_dir: str = BACKEND_DIR):
+    """Run main:app from backend_dir and return (process, base_url) once it answers."""
+    tmp_dir = tempfile.mkdtemp(prefix="bench_server_")
+    port = free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}", **(env or {})),
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            requests.get(f"{base_url}/api/health", timeout=1)
+            return proc, base_url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(proc):
+    proc.terminate()
+    proc.wait()
@@ -0,0 +1,280 @@
+"""End-to-end benchmark of ingest, fetch, list and export against a fake upstream.
+
+Run from the backend directory:
+
+    python -m benchmarks.suite --sizes 1000,10000 --out results.json
+    python -m benchmarks.suite --sizes 1000 --latency 0.05 --throttle-rate 0.02 --compare results.json
+
+For every roster size a fresh uvicorn server is started on a throwaway
+SQLite database with the scraper pointed at benchmarks.fake_upstream. The
+phases run in order:
+
+    ingest  upload the generated .xlsx roster (replace mode), --repeat times
+    fetch   a refresh job limited to --fetch-seconds; latency is per upstream call
+    list    --list-requests student list pages from --concurrency clients
+    export  the category as xlsx and csv, --repeat times each
+
+Each phase reports throughput, p50/p99 latency and the server's peak RSS
+during the phase (Linux only). Results are written as JSON. --compare
+prints the throughput change against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from benchmarks.fake_upstream import start_fake_upstream
+from benchmarks.rosters import roster_path
+from benchmarks.server import ADMIN, BACKEND_DIR, start_server, stop_server
+
+
+def quantile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def reset_peak_rss(pid: int):
+    """Reset the process's high-water RSS mark so the next phase is measured alone."""
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def histogram_quantiles(metrics_text: str, name: str, quantiles: tuple) -> list:
+    """Approximate quantiles (bucket upper bounds) of a histogram summed over its labels."""
+    buckets = {}
+    for line in metrics_text.splitlines():
+        if line.startswith(f"{name}_bucket{{"):
+            series, count = line.rsplit(" ", 1)
+            bound = series.split('le="', 1)[1].split('"', 1)[0]
+            bound = float("inf") if bound == "+Inf" else float(bound)
+            buckets[bound] = buckets.get(bound, 0) + float(count)
+    if not buckets:
+        return [None] * len(quantiles)
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]]
+    return [next(b for b in bounds if buckets[b] >= q * total) for q in quantiles]
+
+
+def result(size: int, phase: str, count: int, unit: str, seconds: float, latencies: list, pid: int) -> dict:
+    return {
+        "size": size,
+        "phase": phase,
+        "throughput": round(count / seconds, 1) if seconds else None,
+        "unit": f"{unit}/s",
+        "p50_ms": round(quantile(latencies, 0.5) * 1000, 1) if latencies else None,
+        "p99_ms": round(quantile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "peak_rss_mb": peak_rss_mb(pid),
+    }
+
+
+def bench_ingest(base_url, headers, pid, size, repeat) -> dict:
+    path = roster_path(size)
+    with open(path, "rb") as f:
+        workbook = f.read()
+    reset_peak_rss(pid)
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        requests.post(
+            f"{base_url}/api/upload/2nd_year?mode=replace",
+            headers=headers,
+            files={"file": (os.path.basename(path), workbook)},
+        ).raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return result(size, "ingest", size * repeat, "rows", sum(latencies), latencies, pid)
+
+
+def bench_fetch(base_url, headers, pid, size, seconds) -> dict:
+    reset_peak_rss(pid)
+    started = time.perf_counter()
+    job = requests.post(
+        f"{base_url}/api/jobs/fetch/2nd_year?time_budget={seconds}", headers=headers
+    ).json()
+    after = 0
+    while True:
+        status = requests.get(f"{base_url}/api/jobs/{job['job_id']}?after={after}", headers=headers).json()
+        if status["results"]:
+            after = status["results"][-1]["item_id"]
+        if status["status"] not in ("queued", "running"):
+            break
+        time.sleep(0.5)
+    elapsed = time.perf_counter() - started
+
+    p50, p99 = histogram_quantiles(
+        requests.get(f"{base_url}/api/metrics", headers=headers).text, "upstream_request_duration_seconds", (0.5, 0.99)
+    )
+    row = result(size, "fetch", status["completed"] + status["failed"], "students", elapsed, [], pid)
+    row["p50_ms"] = round(p50 * 1000, 1) if p50 not in (None, float("inf")) else None
+    row["p99_ms"] = round(p99 * 1000, 1) if p99 not in (None, float("inf")) else None
+    return row
+
+
+def bench_list(base_url, headers, pid, size, total_requests, concurrency) -> dict:
+    first = requests.get(f"{base_url}/api/students/2nd_year?limit=50", headers=headers).json()
+    paths = [
+        "/api/students/2nd_year?limit=50",
+        "/api/students/2nd_year?limit=50&sort=leetcode_solved&order=desc",
+        "/api/students/2nd_year?limit=50&search=21BCE0000",
+    ]
+    if first["next_cursor"]:
+        paths.append(f"/api/students/2nd_year?limit=50&cursor={first['next_cursor']}")
+
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def client():
+        with requests.Session() as session:
+            for i in counter:
+                started = time.perf_counter()
+                session.get(f"{base_url}{paths[i % len(paths)]}", headers=headers).raise_for_status()
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+
+    reset_peak_rss(pid)
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return result(size, "list", len(latencies), "requests", time.perf_counter() - started, latencies, pid)
+
+
+def bench_export(base_url, headers, pid, size, repeat, fmt) -> dict:
+    reset_peak_rss(pid)
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        with requests.get(f"{base_url}/api/export/2nd_year?format={fmt}", headers=headers, stream=True) as response:
+            response.raise_for_status()
+            for _ in response.iter_content(64 * 1024):
+                pass
+        latencies.append(time.perf_counter() - started)
+    return result(size, f"export_{fmt}", size * repeat, "rows", sum(latencies), latencies, pid)
+
+
+def run_size(size: int, args) -> list:
+    upstream, upstream_url = start_fake_upstream(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+    )
+    proc, base_url = start_server({
+        "LEETCODE_GRAPHQL_URL": f"{upstream_url}/graphql",
+        "HACKERRANK_BASE_URL": upstream_url,
+        "SCRAPER_RATE_INITIAL": str(args.upstream_rate),
+        "SCRAPER_RATE_MAX": str(args.upstream_rate),
+        "SCRAPER_MAX_RETRY_AFTER": "1",
+    })
+    try:
+        token = requests.post(f"{base_url}/api/auth/login", json=ADMIN).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        rows = [
+            bench_ingest(base_url, headers, proc.pid, size, args.repeat),
+            bench_fetch(base_url, headers, proc.pid, size, args.fetch_seconds),
+            bench_list(base_url, headers, proc.pid, size, args.list_requests, args.concurrency),
+            bench_export(base_url, headers, proc.pid, size, args.repeat, "xlsx"),
+            bench_export(base_url, headers, proc.pid, size, args.repeat, "csv"),
+        ]
+    finally:
+        stop_server(proc)
+        upstream.shutdown()
+    return rows
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list, baseline: dict = None):
+    previous = {(r["size"], r["phase"]): r for r in (baseline or {}).get("results", [])}
+    print(
+        f"{'size':>7} {'phase':<12} {'throughput':>12} {'unit':<13} {'p50 ms':>8} {'p99 ms':>8} {'peak RSS MB':>12}"
+        + (f" {'vs baseline':>12}" if baseline else "")
+    )
+    for r in results:
+        line = (
+            f"{r['size']:>7} {r['phase']:<12} {r['throughput'] or 0:>12.1f} {r['unit']:<13}"
+            f" {r['p50_ms'] if r['p50_ms'] is not None else '-':>8} {r['p99_ms'] if r['p99_ms'] is not None else '-':>8}"
+            f" {r['peak_rss_mb'] if r['peak_rss_mb'] is not None else '-':>12}"
+        )
+        old = previous.get((r["size"], r["phase"]))
+        if baseline:
+            if old and old["throughput"] and r["throughput"]:
+                line += f" {(r['throughput'] / old['throughput'] - 1) * 100:>+11.1f}%"
+            else:
+                line += f" {'-':>12}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated roster sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each ingest and export")
+    parser.add_argument("--fetch-seconds", type=int, default=20, help="time budget of the fetch job")
+    parser.add_argument("--list-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--upstream-rate", type=float, default=200, help="scraper requests/s allowed per host")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake upstream response delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream 500s")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of upstream 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", help="earlier results JSON to compare throughput against")
+    args = parser.parse_args()
+
+    results = []
+    for size in map(int, args.sizes.split(",")):
+        results.extend(run_size(size, args))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "options": vars(args),
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
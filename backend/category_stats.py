@@ -0,0 +1,209 @@
+"""Materialized per-category aggregates behind /api/stats/{category}.
+
+Each (user, category) has one category_stats row holding a JSON summary:
+student and fetch counts, a histogram of LeetCode solved counts, the star
+distribution per language and a top-N leaderboard. Fetches update the
+summary incrementally from the old and new values of the students they
+wrote; uploads and deletes rebuild it with a few grouped queries. Reading
+the stats never touches the students table.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, update
+
+from models import CategoryStats, Student
+from queries import student_filters
+
+
+# Students listed on the category leaderboard
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+
+STAR_FIELDS = {
+    "java": "hr_java_stars",
+    "python": "hr_python_stars",
+    "c": "hr_c_stars",
+    "sql": "hr_sql_stars",
+}
+
+PERCENTILES = (25, 50, 75, 90)
+
+
+def _leader(student: dict) -> dict:
+    return {
+        "id": student["id"],
+        "name": student["name"],
+        "roll_number": student["roll_number"],
+        "leetcode_solved": student["leetcode_solved"],
+    }
+
+
+def _rank(leader: dict):
+    return (-leader["leetcode_solved"], leader["roll_number"])
+
+
+def _top_students(db, user_id: int, category: str) -> list:
+    rows = db.execute(
+        select(Student.id, Student.name, Student.roll_number, Student.leetcode_solved)
+        .where(*student_filters(user_id, category), Student.leetcode_solved.isnot(None))
+        .order_by(Student.leetcode_solved.desc(), Student.roll_number)
+        .limit(LEADERBOARD_SIZE)
+    )
+    return [_leader(row._mapping) for row in rows]
+
+
+def _histogram(db, criteria: list, column) -> dict:
+    rows = db.execute(
+        select(column, func.count()).where(*criteria, column.isnot(None)).group_by(column)
+    )
+    return {str(value): count for value, count in rows}
+
+
+def _save(db, user_id: int, category: str, summary: dict, row: CategoryStats = None) -> dict:
+    if row is None:
+        row = CategoryStats(user_id=user_id, category=category)
+        db.add(row)
+    row.data = json.dumps(summary)
+    row.updated_at = datetime.now(timezone.utc)
+    return summary
+
+
+def rebuild_stats(db, user_id: int, category: str) -> dict:
+    """Recompute a category's summary from the students table; the caller commits."""
+    db.flush()
+    criteria = student_filters(user_id, category)
+    count, fetched = db.execute(
+        select(func.count(Student.id), func.count(Student.last_fetched)).where(*criteria)
+    ).one()
+    summary = {
+        "count": count,
+        "fetched": fetched,
+        "leetcode": _histogram(db, criteria, Student.leetcode_solved),
+        "stars": {
+            language: _histogram(db, criteria, getattr(Student, field))
+            for language, field in STAR_FIELDS.items()
+        },
+        "top": _top_students(db, user_id, category),
+    }
+    row = db.query(CategoryStats).filter(
+        CategoryStats.user_id == user_id, CategoryStats.category == category
+    ).first()
+    return _save(db, user_id, category, summary, row)
+
+
+def _move(histogram: dict, old, new):
+    if old == new:
+        return
+    if old is not None:
+        key = str(old)
+        histogram[key] = histogram.get(key, 0) - 1
+        if histogram[key] <= 0:
+            del histogram[key]
+    if new is not None:
+        histogram[str(new)] = histogram.get(str(new), 0) + 1
+
+
+def _locked_row(db, user_id: int, category: str) -> CategoryStats:
+    """Read a category's stats row, locking it until the caller's transaction ends.
+
+    Concurrent writers then apply their deltas one after the other instead of
+    overwriting each other's read-modify-write.
+    """
+    criteria = (CategoryStats.user_id == user_id, CategoryStats.category == category)
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite ignores FOR UPDATE; a write takes its database lock instead
+        db.execute(update(CategoryStats).where(*criteria).values(updated_at=CategoryStats.updated_at))
+    return db.query(CategoryStats).filter(*criteria).with_for_update().populate_existing().first()
+
+
+def update_stats(db, user_id: int, category: str, changes: list):
+    """Fold freshly fetched values into a category's summary; the caller commits.
+
+    changes holds (before, after) pairs: the student's scores and
+    last_fetched as returned by apply_scrape_result, and the student as
+    student_to_dict after the fetch. The leaderboard is only re-queried when
+    one of its entries dropped and something outside it might now rank higher.
+    """
+    if not changes:
+        return
+    row = _locked_row(db, user_id, category)
+    if row is None:
+        rebuild_stats(db, user_id, category)
+        return
+
+    summary = json.loads(row.data)
+    top = {leader["id"]: leader for leader in summary["top"]}
+    refill = False
+    for before, after in changes:
+        if before["last_fetched"] is None and after["last_fetched"] is not None:
+            summary["fetched"] += 1
+        _move(summary["leetcode"], before["leetcode_solved"], after["leetcode_solved"])
+        for language, field in STAR_FIELDS.items():
+            _move(summary["stars"][language], before[field], after[field])
+
+        previous = top.pop(after["id"], None)
+        if after["leetcode_solved"] is not None:
+            top[after["id"]] = _leader(after)
+        if previous is not None and (
+            after["leetcode_solved"] is None or after["leetcode_solved"] < previous["leetcode_solved"]
+        ):
+            refill = True
+
+    ranked = sorted(top.values(), key=_rank)
+    if refill and len(ranked) < sum(summary["leetcode"].values()):
+        db.flush()
+        summary["top"] = _top_students(db, user_id, category)
+    else:
+        summary["top"] = ranked[:LEADERBOARD_SIZE]
+    _save(db, user_id, category, summary, row)
+
+
+def _percentile(histogram: list, total: int, percent: int):
+    """Nearest-rank percentile from (value, count) pairs sorted by value."""
+    rank = max(1, -(-percent * total // 100))
+    seen = 0
+    for value, count in histogram:
+        seen += count
+        if seen >= rank:
+            return value
+    return None
+
+
+def stats_response(summary: dict) -> dict:
+    histogram = sorted((int(value), count) for value, count in summary["leetcode"].items())
+    solved = sum(count for _, count in histogram)
+    leetcode = {"students": solved, "mean": None, "min": None, "max": None}
+    leetcode.update({f"p{percent}": None for percent in PERCENTILES})
+    if solved:
+        leetcode["mean"] = round(sum(value * count for value, count in histogram) / solved, 2)
+        leetcode["min"] = histogram[0][0]
+        leetcode["max"] = histogram[-1][0]
+        for percent in PERCENTILES:
+            leetcode[f"p{percent}"] = _percentile(histogram, solved, percent)
+    leetcode["median"] = leetcode["p50"]
+
+    return {
+        "count": summary["count"],
+        "fetched": summary["fetched"],
+        "coverage": round(summary["fetched"] / summary["count"], 4) if summary["count"] else 0.0,
+        "leetcode": leetcode,
+        "stars": {
+            language: {**{str(stars): 0 for stars in range(6)}, **distribution}
+            for language, distribution in summary["stars"].items()
+        },
+        "leaderboard": summary["top"],
+    }
+
+
+def get_stats(db, user_id: int, category: str) -> dict:
+    """Read a category's materialized summary, building it on first use."""
+    row = db.query(CategoryStats).filter(
+        CategoryStats.user_id == user_id, CategoryStats.category == category
+    ).first()
+    if row is None:
+        summary = rebuild_stats(db, user_id, category)
+        db.commit()
+    else:
+        summary = json.loads(row.data)
+    return stats_response(summary)
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+
+from metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+
+# Consecutive timeouts, connection errors or 5xx responses that open a platform's circuit
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+# Seconds an open circuit rejects calls before letting a probe through
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+# Upper bound on the reset timeout, which doubles each time a probe fails
+CIRCUIT_MAX_RESET_TIMEOUT = float(os.getenv("CIRCUIT_MAX_RESET_TIMEOUT", "600"))
+# Probe calls allowed at once while a circuit is half-open
+CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "1"))
+
+STATES = ("closed", "half_open", "open")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a platform whose circuit is open."""
+
+    def __init__(self, platform: str, retry_in: float):
+        super().__init__(f"{platform} circuit is open; retrying in {retry_in:.0f}s")
+        self.platform = platform
+        self.retry_in = retry_in
+
+
+class _CircuitState:
+    def __init__(self, reset_timeout: float):
+        self.state = "closed"
+        self.failures = 0
+        self.reset_timeout = reset_timeout
+        self.opened_at = 0.0
+        self.probes = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+
+class CircuitBreaker:
+    """Per-platform circuit breakers for the upstream profile APIs.
+
+    A platform's circuit opens after failure_threshold consecutive failed
+    calls, and calls are then rejected with CircuitOpenError instead of each
+    waiting out its own timeout. After reset_timeout a limited number of
+    probe calls are let through (half-open): a success closes the circuit,
+    a failure opens it again for twice as long, up to max_reset_timeout.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        max_reset_timeout: float = CIRCUIT_MAX_RESET_TIMEOUT,
+        half_open_probes: int = CIRCUIT_HALF_OPEN_PROBES,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.half_open_probes = half_open_probes
+        self._platforms = {}
+        self._lock = threading.Lock()
+
+    def _state(self, platform: str) -> _CircuitState:
+        state = self._platforms.get(platform)
+        if state is None:
+            state = self._platforms[platform] = _CircuitState(self.reset_timeout)
+            CIRCUIT_STATE.set(STATES.index("closed"), platform=platform)
+        return state
+
+    def _transition(self, platform: str, state: _CircuitState, to: str):
+        state.state = to
+        CIRCUIT_TRANSITIONS.inc(platform=platform, state=to)
+        CIRCUIT_STATE.set(STATES.index(to), platform=platform)
+
+    def before_call(self, platform: str):
+        """Raise CircuitOpenError unless a call to platform may go ahead.
+
+        Every allowed call must be followed by record_success or record_failure.
+        """
+        with self._lock:
+            state = self._state(platform)
+            if state.state == "open":
+                retry_in = state.opened_at + state.reset_timeout - time.monotonic()
+                if retry_in > 0:
+                    state.rejected += 1
+                    raise CircuitOpenError(platform, retry_in)
+                self._transition(platform, state, "half_open")
+                state.probes = 0
+            if state.state == "half_open":
+                if state.probes >= self.half_open_probes:
+                    state.rejected += 1
+                    raise CircuitOpenError(platform, 0)
+                state.probes += 1
+
+    def record_success(self, platform: str):
+        with self._lock:
+            state = self._state(platform)
+            state.failures = 0
+            if state.state != "closed":
+                self._transition(platform, state, "closed")
+                state.reset_timeout = self.reset_timeout
+
+    def record_failure(self, platform: str):
+        with self._lock:
+            state = self._state(platform)
+            state.failures += 1
+            if state.state == "half_open":
+                state.reset_timeout = min(self.max_reset_timeout, state.reset_timeout * 2)
+            elif state.state == "open" or state.failures < self.failure_threshold:
+                return
+            self._transition(platform, state, "open")
+            state.opened_at = time.monotonic()
+            state.times_opened += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                platform: {
+                    "state": state.state,
+                    "consecutive_failures": state.failures,
+                    "times_opened": state.times_opened,
+                    "rejected_calls": state.rejected,
+                    "retry_in_seconds": round(max(0.0, state.opened_at + state.reset_timeout - now), 3)
+                    if state.state == "open" else 0.0,
+                }
+                for platform, state in self._platforms.items()
+            }
+
+
+breaker = CircuitBreaker()
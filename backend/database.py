@@ -1,6 +1,8 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -15,10 +17,52 @@ if DATABASE_URL.startswith("sqlite:///"):
     if not os.path.isabs(path):
         DATABASE_URL = f"sqlite:///{os.path.abspath(path)}"
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+# Same database through an asyncio driver, used by the async routes
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+if not ASYNC_DATABASE_URL:
+    if DATABASE_URL.startswith("sqlite:"):
+        ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    else:
+        # postgres://, postgresql:// and postgresql+psycopg2:// all map to asyncpg
+        ASYNC_DATABASE_URL = "postgresql+asyncpg://" + DATABASE_URL.split("://", 1)[1]
+
+# Connection pool settings, applied to both engines (each has its own pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Test connections before use so ones dropped by the server are replaced;
+# off by default on SQLite, which has no server to drop them
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0" if DATABASE_URL.startswith("sqlite") else "1") == "1"
+# Seconds after which a connection is replaced; keep below the server's idle timeout
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+POOL_OPTIONS = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+    "pool_recycle": DB_POOL_RECYCLE,
+}
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+    **POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    # aiosqlite defaults to NullPool on SQLAlchemy 2.0, which rejects the
+    # pool options and opens a connection per session; pool it like the rest
+    poolclass=AsyncAdaptedQueuePool,
+    **POOL_OPTIONS,
+)
+# Objects stay readable after commit; an async session can't lazily reload them
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -28,6 +72,12 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Session dependency for `async def` routes, so queries don't block the event loop."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
-    from models import User, Student
-    Base.metadata.create_all(bind=engine)
+    from migrations import upgrade
+    upgrade()
@@ -1,13 +1,12 @@
 from main import app
-from database import engine, Base
-import models
+import migrations
 
 try:
-    print("Creating tables...")
-    Base.metadata.create_all(bind=engine)
-    print("Tables created.")
+    print("Applying migrations...")
+    applied = migrations.upgrade()
+    print(f"Applied {len(applied)} migration(s).")
 except Exception as e:
-    print(f"Error creating tables: {e}")
+    print(f"Error applying migrations: {e}")
 
 from main import startup
 try:
@@ -0,0 +1,123 @@
+import csv
+import io
+import os
+import tempfile
+import time
+
+import openpyxl
+from sqlalchemy import select
+
+from database import SessionLocal
+from metrics import EXPORT_SECONDS
+from models import Student
+
+
+# Rows fetched from the database cursor at a time
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+# Bytes buffered before a chunk is sent to the client
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+EXPORT_HEADERS = [
+    "S.No",
+    "Name",
+    "Roll Number",
+    "LeetCode Solved",
+    "Java Stars",
+    "Python Stars",
+    "C Stars",
+    "SQL Stars",
+    "LeetCode URL",
+    "HackerRank URL",
+]
+
+EXPORT_COLUMNS = (
+    Student.name,
+    Student.roll_number,
+    Student.leetcode_solved,
+    Student.hr_java_stars,
+    Student.hr_python_stars,
+    Student.hr_c_stars,
+    Student.hr_sql_stars,
+    Student.leetcode_url,
+    Student.hackerrank_url,
+)
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+
+def iter_export_rows(db, criteria: list):
+    """Yield export rows (with serial numbers) for the matching students.
+
+    Plain column tuples are streamed from a server-side cursor in
+    EXPORT_CHUNK_SIZE batches instead of loading ORM objects.
+    """
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .where(*criteria)
+        .order_by(Student.roll_number)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    for idx, row in enumerate(db.execute(statement), 1):
+        yield (idx, *row)
+
+
+def write_csv(rows):
+    """Yield CSV-encoded chunks of roughly EXPORT_BUFFER_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_BUFFER_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def write_xlsx(rows, title: str):
+    """Yield the bytes of an .xlsx workbook built with constant memory.
+
+    An .xlsx file is a zip archive whose directory comes last, so unlike CSV
+    it can't be sent while rows are still being read. A write_only workbook
+    spills rows to a temp file as they are appended, the finished workbook is
+    saved to another temp file, and only then is it streamed back in chunks
+    and removed. Memory stays flat, but the first byte waits for the whole
+    export to be written.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    sheet.append(EXPORT_HEADERS)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile(suffix=".xlsx") as f:
+        workbook.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(EXPORT_BUFFER_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+def stream_export(fmt: str, criteria: list, category: str):
+    """Yield the encoded export file, reading students with its own session.
+
+    The request's session is closed before a streaming response body runs,
+    so the generator opens (and closes) one for the duration of the download.
+    """
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        rows = iter_export_rows(db, criteria)
+        if fmt == "csv":
+            yield from write_csv(rows)
+        else:
+            yield from write_xlsx(rows, f"{category.replace('_', ' ').title()} Data")
+        EXPORT_SECONDS.observe(time.perf_counter() - started, format=fmt)
+    finally:
+        db.close()
@@ -0,0 +1,122 @@
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+    import h2  # noqa: F401 - httpx only speaks HTTP/2 when h2 is installed
+except ImportError:
+    httpx = None
+
+
+# Connections kept open per upstream host
+SCRAPER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "16"))
+# Reuse connections between requests; set to 0 to close after every call
+SCRAPER_KEEPALIVE = os.getenv("SCRAPER_KEEPALIVE", "1") == "1"
+# Use HTTP/2 through httpx when it is installed with the h2 extra
+SCRAPER_HTTP2 = os.getenv("SCRAPER_HTTP2", "0") == "1"
+# Retries for failed connection attempts (status-based retries happen in scraper._request)
+SCRAPER_CONNECT_RETRIES = int(os.getenv("SCRAPER_CONNECT_RETRIES", "2"))
+
+
+class HostPools:
+    """One pooled HTTP client per upstream host, shared by every thread.
+
+    Clients are created on first use and closed by close(), which the app
+    calls on shutdown. Request and connection counts are exposed through stats().
+    """
+
+    def __init__(
+        self,
+        pool_size: int = SCRAPER_POOL_SIZE,
+        keepalive: bool = SCRAPER_KEEPALIVE,
+        http2: bool = SCRAPER_HTTP2,
+        connect_retries: int = SCRAPER_CONNECT_RETRIES,
+    ):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.http2 = http2 and httpx is not None
+        self.connect_retries = connect_retries
+        self.errors = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+        self._clients = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def _create_client(self):
+        headers = {} if self.keepalive else {"Connection": "close"}
+        if self.http2:
+            # The client ignores limits when given a transport, so they go on the transport
+            limits = httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size if self.keepalive else 0,
+            )
+            return httpx.Client(
+                headers=headers,
+                transport=httpx.HTTPTransport(http2=True, retries=self.connect_retries, limits=limits),
+            )
+
+        session = requests.Session()
+        session.headers.update(headers)
+        # urllib3 would otherwise treat a 429 or 503 with Retry-After as a
+        # failed status retry and raise instead of returning the response
+        retries = Retry(
+            total=self.connect_retries,
+            connect=self.connect_retries,
+            read=0,
+            status=0,
+            redirect=3,
+            respect_retry_after_header=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retries)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def client(self, host: str):
+        with self._lock:
+            client = self._clients.get(host)
+            if client is None:
+                client = self._clients[host] = self._create_client()
+            return client
+
+    def request(self, method: str, url: str, **kwargs):
+        host = urlparse(url).netloc
+        client = self.client(host)
+        with self._lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+        return client.request(method, url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            clients = dict(self._clients)
+            request_counts = dict(self._requests)
+
+        stats = {}
+        for host, client in clients.items():
+            host_stats = {
+                "protocol": "http/2" if self.http2 else "http/1.1",
+                "pool_size": self.pool_size,
+                "keepalive": self.keepalive,
+                "requests": request_counts.get(host, 0),
+            }
+            if isinstance(client, requests.Session):
+                # urllib3 counts every new connection it opens per pool
+                poolmanager = client.get_adapter(f"https://{host}").poolmanager
+                pools = [poolmanager.pools[key] for key in poolmanager.pools.keys()]
+                host_stats["connections_opened"] = sum(pool.num_connections for pool in pools)
+            stats[host] = host_stats
+        return stats
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+pools = HostPools()
@@ -0,0 +1,300 @@
+import csv
+import io
+import os
+import time
+
+import openpyxl
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+from models import Student
+from snapshots import delete_snapshots
+
+
+# Student rows sent to the database per bulk insert
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+# Row errors listed individually in an ingest report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+EXPECTED_COLUMNS = "Name, Roll Number, Leetcode Profile URL, HackerRank URL"
+
+
+class IngestError(ValueError):
+    """Raised when an uploaded roster can't be ingested at all."""
+
+
+def detect_columns(header_row) -> dict:
+    """Map student fields to 0-based column indexes from a roster's header row."""
+    columns = {}
+    for col_idx, value in enumerate(header_row or ()):
+        if value:
+            header_lower = str(value).strip().lower()
+            if "name" in header_lower and "roll" not in header_lower:
+                columns["name"] = col_idx
+            elif "roll" in header_lower:
+                columns["roll_number"] = col_idx
+            elif "leetcode" in header_lower:
+                columns["leetcode_url"] = col_idx
+            elif "hackerrank" in header_lower or "hacker" in header_lower:
+                columns["hackerrank_url"] = col_idx
+
+    for req_field in ("name", "roll_number"):
+        if req_field not in columns:
+            raise IngestError(f"Column '{req_field}' not found. Expected columns: {EXPECTED_COLUMNS}")
+    return columns
+
+
+def iter_xlsx_rows(fileobj):
+    """Yield each row of the active sheet as a tuple of values, without loading the workbook."""
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_csv_rows(fileobj):
+    """Yield each row of a CSV file as a list of strings, reading it line by line."""
+    sample = fileobj.read(8192)
+    fileobj.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample.decode("utf-8-sig", errors="ignore"), delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.reader(text, dialect)
+    finally:
+        # Leave the underlying upload open for its owner to close
+        text.detach()
+
+
+def iter_parquet_rows(fileobj):
+    """Yield the column names of a Parquet file, then its rows, one record batch at a time."""
+    if pq is None:
+        raise IngestError("Parquet uploads require pyarrow to be installed on the server")
+    parquet_file = pq.ParquetFile(fileobj)
+    yield tuple(parquet_file.schema_arrow.names)
+    for batch in parquet_file.iter_batches(batch_size=INGEST_BATCH_SIZE):
+        yield from zip(*batch.to_pydict().values())
+
+
+ROW_READERS = {
+    ".xlsx": iter_xlsx_rows,
+    ".xls": iter_xlsx_rows,
+    ".csv": iter_csv_rows,
+    ".parquet": iter_parquet_rows,
+}
+
+
+def reader_for(filename: str):
+    """Return the row reader for an uploaded file name, or None if the format isn't supported."""
+    return ROW_READERS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def _cell(row, columns: dict, field: str):
+    idx = columns.get(field)
+    if idx is None or idx >= len(row):
+        return None
+    value = row[idx]
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def parse_row(row, columns: dict):
+    """Turn a roster row into Student column values.
+
+    Returns (values, error); both are None for blank rows.
+    """
+    if not row or all(value is None or str(value).strip() == "" for value in row):
+        return None, None
+
+    name = _cell(row, columns, "name")
+    if not name:
+        return None, "Missing name"
+
+    return {
+        "name": name,
+        # Rosters without roll numbers have always been accepted
+        "roll_number": _cell(row, columns, "roll_number") or "",
+        "leetcode_url": _cell(row, columns, "leetcode_url") or "",
+        "hackerrank_url": _cell(row, columns, "hackerrank_url") or "",
+    }, None
+
+
+class _RowErrors:
+    def __init__(self):
+        self.count = 0
+        self.reported = []
+
+    def add(self, row_number: int, error: str):
+        self.count += 1
+        if len(self.reported) < MAX_REPORTED_ERRORS:
+            self.reported.append({"row": row_number, "error": error})
+
+
+def _records(rows, columns: dict, errors: _RowErrors):
+    """Yield (row_number, values) for every usable data row."""
+    for row_number, row in enumerate(rows, start=2):
+        values, error = parse_row(row, columns)
+        if error:
+            errors.add(row_number, error)
+        if values:
+            yield row_number, values
+
+
+def _merge_key(roll_number: str, name: str) -> tuple:
+    """Students are matched on roll number, or on name when they have none."""
+    return (roll_number, None) if roll_number else (None, name)
+
+
+def _flush(db, method, mappings: list) -> int:
+    if mappings:
+        method(Student, mappings)
+    return len(mappings)
+
+
+def ingest_rows(db, rows, category: str, user_id: int) -> dict:
+    """Replace a user's roster for a category with the given rows.
+
+    rows is an iterator of value tuples whose first item is the header row,
+    as produced by any of the ROW_READERS, so header detection and row
+    validation are the same for every format.
+    Students are written with batched bulk inserts in the caller's
+    transaction; the caller commits. Rows that can't be used are skipped and
+    listed in the report's "errors" with their 1-based row number.
+    """
+    started = time.perf_counter()
+    rows = iter(rows)
+    columns = detect_columns(next(rows, None))
+
+    delete_snapshots(db, [Student.category == category, Student.uploaded_by == user_id])
+    db.query(Student).filter(
+        Student.category == category,
+        Student.uploaded_by == user_id,
+    ).delete(synchronize_session=False)
+
+    added = 0
+    errors = _RowErrors()
+    batch = []
+    for _, values in _records(rows, columns, errors):
+        values["category"] = category
+        values["uploaded_by"] = user_id
+        batch.append(values)
+        if len(batch) >= INGEST_BATCH_SIZE:
+            added += _flush(db, db.bulk_insert_mappings, batch)
+            batch = []
+    added += _flush(db, db.bulk_insert_mappings, batch)
+
+    return _report(started, added, errors, added=added)
+
+
+def merge_rows(db, rows, category: str, user_id: int) -> dict:
+    """Merge the given rows into a user's roster for a category, keyed on roll number.
+
+    New roll numbers are inserted, students whose row is unchanged keep their
+    scraped stats, and students missing from the upload are deleted. Students
+    without a roll number are matched on their name instead. When a profile
+    URL changes only that platform's stats are cleared, along with
+    last_fetched so the next incremental refresh picks the student up. All
+    writes are batched into the caller's transaction; the caller commits.
+    """
+    started = time.perf_counter()
+    rows = iter(rows)
+    columns = detect_columns(next(rows, None))
+
+    existing = {}
+    duplicate_ids = []
+    for student in (
+        db.query(Student.id, Student.roll_number, Student.name, Student.leetcode_url, Student.hackerrank_url)
+        .filter(Student.category == category, Student.uploaded_by == user_id)
+        .order_by(Student.id)
+    ):
+        key = _merge_key(student.roll_number, student.name)
+        if key in existing:
+            # Left over from an older upload with repeated roll numbers
+            duplicate_ids.append(student.id)
+        else:
+            existing[key] = student
+
+    added = updated = unchanged = 0
+    errors = _RowErrors()
+    seen = set()
+    inserts = []
+    updates = []
+    for row_number, values in _records(rows, columns, errors):
+        roll_number = values["roll_number"]
+        key = _merge_key(roll_number, values["name"])
+        if key in seen:
+            if roll_number:
+                errors.add(row_number, f"Duplicate roll number {roll_number}")
+            else:
+                errors.add(row_number, f"Duplicate name {values['name']} without a roll number")
+            continue
+        seen.add(key)
+
+        current = existing.get(key)
+        if current is None:
+            values["category"] = category
+            values["uploaded_by"] = user_id
+            inserts.append(values)
+        else:
+            changes = {
+                field: values[field]
+                for field in ("name", "leetcode_url", "hackerrank_url")
+                if values[field] != (getattr(current, field) or "")
+            }
+            if not changes:
+                unchanged += 1
+                continue
+            if "leetcode_url" in changes:
+                changes["leetcode_solved"] = None
+            if "hackerrank_url" in changes:
+                changes.update(hr_java_stars=None, hr_python_stars=None, hr_c_stars=None, hr_sql_stars=None)
+            if "leetcode_url" in changes or "hackerrank_url" in changes:
+                changes["last_fetched"] = None
+            changes["id"] = current.id
+            updates.append(changes)
+
+        if len(inserts) >= INGEST_BATCH_SIZE:
+            added += _flush(db, db.bulk_insert_mappings, inserts)
+            inserts = []
+        if len(updates) >= INGEST_BATCH_SIZE:
+            updated += _flush(db, db.bulk_update_mappings, updates)
+            updates = []
+    added += _flush(db, db.bulk_insert_mappings, inserts)
+    updated += _flush(db, db.bulk_update_mappings, updates)
+
+    removed_ids = [s.id for key, s in existing.items() if key not in seen] + duplicate_ids
+    for start in range(0, len(removed_ids), INGEST_BATCH_SIZE):
+        batch_ids = removed_ids[start:start + INGEST_BATCH_SIZE]
+        delete_snapshots(db, [Student.id.in_(batch_ids)])
+        db.query(Student).filter(Student.id.in_(batch_ids)).delete(synchronize_session=False)
+
+    return _report(
+        started,
+        added + updated + unchanged,
+        errors,
+        added=added,
+        updated=updated,
+        removed=len(removed_ids),
+        unchanged=unchanged,
+    )
+
+
+def _report(started: float, count: int, errors: _RowErrors, **counts) -> dict:
+    elapsed = time.perf_counter() - started
+    return {
+        "count": count,
+        **counts,
+        "errors": errors.reported,
+        "error_count": errors.count,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(count / elapsed) if elapsed > 0 else None,
+    }
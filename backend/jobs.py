@@ -0,0 +1,390 @@
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_, update
+
+import leases
+from database import SessionLocal, engine
+from models import ScrapeJob, ScrapeJobItem
+from refresh import apply_scrape_result, scrape_failures, student_to_dict
+from refresh import select_students_for_refresh
+from scraper import ScrapeBudget, duplicate_lookups, scrape_students_data
+from category_stats import update_stats
+from snapshots import SNAPSHOT_BATCH_SIZE, prune_snapshots, record_snapshots, snapshot_values
+from queries import student_filters
+
+
+# Number of category refreshes this process may scrape at the same time;
+# 0 leaves queued jobs to worker.py processes
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Seconds between attempts to take a category's lease while another job holds it
+LEASE_RETRY_INTERVAL = float(os.getenv("LEASE_RETRY_INTERVAL", "2"))
+# Longest a job keeps finished students uncommitted when its batch isn't full yet
+JOB_COMMIT_INTERVAL = float(os.getenv("JOB_COMMIT_INTERVAL", "2"))
+# Seconds between looks for queued or abandoned jobs while this process has idle job threads
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="scrape-job") if JOB_WORKERS else None
+_running = 0  # jobs submitted to _executor and not yet finished
+_running_lock = threading.Lock()
+_stop_polling = threading.Event()
+
+
+def create_job(
+    db,
+    user_id: int,
+    category: str,
+    total: int,
+    max_age: int = None,
+    time_budget: int = None,
+    max_requests: int = None,
+    scheduled: bool = False,
+    claimed_by: str = None,
+) -> ScrapeJob:
+    """Queue a job; with claimed_by it is created already claimed by that holder."""
+    job = ScrapeJob(
+        category=category,
+        requested_by=user_id,
+        status="queued",
+        total=total,
+        max_age=max_age,
+        time_budget=time_budget,
+        max_requests=max_requests,
+        scheduled=scheduled,
+        claimed_by=claimed_by,
+        lease_expires_at=leases.utcnow() + timedelta(seconds=leases.LEASE_SECONDS) if claimed_by else None,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def find_active_job(db, user_id: int, category: str, scheduled: bool = None):
+    """Return a queued or running job for the category, optionally only user or scheduled ones."""
+    query = db.query(ScrapeJob).filter(
+        ScrapeJob.requested_by == user_id,
+        ScrapeJob.category == category,
+        ScrapeJob.status.in_(ACTIVE_STATUSES),
+    )
+    if scheduled is not None:
+        query = query.filter(ScrapeJob.scheduled.is_(scheduled))
+    return query.first()
+
+
+def _run_counted(job_id: int, holder: str):
+    global _running
+    try:
+        run_job(job_id, holder)
+    finally:
+        with _running_lock:
+            _running -= 1
+
+
+def submit_job(job_id: int, holder: str = None):
+    """Run a job on this process's job threads, if it has any."""
+    global _running
+    if _executor is None:
+        return
+    with _running_lock:
+        _running += 1
+    _executor.submit(_run_counted, job_id, holder)
+
+
+def poll_jobs():
+    """Claim queued or abandoned jobs whenever a job thread is idle, until shutdown."""
+    while True:
+        try:
+            while _running < JOB_WORKERS:
+                holder = leases.new_token()
+                job_id = claim_next_job(holder)
+                if job_id is None:
+                    break
+                submit_job(job_id, holder)
+        except Exception as e:
+            print(f"Error polling for scrape jobs: {e}")
+        if _stop_polling.wait(JOB_POLL_INTERVAL):
+            return
+
+
+def start_polling():
+    if _executor is not None:
+        threading.Thread(target=poll_jobs, name="scrape-job-poller", daemon=True).start()
+
+
+def claim_job(job_id: int, holder: str) -> bool:
+    """Claim an active job for holder unless a live holder already has it.
+
+    The claim is a compare-and-set on claimed_by and lease_expires_at, so two
+    holders can't both win it; a claim that isn't renewed lapses and the job
+    can be claimed again.
+    """
+    now = leases.utcnow()
+    with engine.begin() as conn:
+        return bool(
+            conn.execute(
+                update(ScrapeJob)
+                .where(
+                    ScrapeJob.id == job_id,
+                    ScrapeJob.status.in_(ACTIVE_STATUSES),
+                    or_(ScrapeJob.claimed_by.is_(None), ScrapeJob.lease_expires_at < now),
+                )
+                .values(claimed_by=holder, lease_expires_at=now + timedelta(seconds=leases.LEASE_SECONDS))
+            ).rowcount
+        )
+
+
+def renew_claim(job_id: int, holder: str) -> bool:
+    with engine.begin() as conn:
+        return bool(
+            conn.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.id == job_id, ScrapeJob.claimed_by == holder)
+                .values(lease_expires_at=leases.utcnow() + timedelta(seconds=leases.LEASE_SECONDS))
+            ).rowcount
+        )
+
+
+def release_claim(job_id: int, holder: str):
+    """Give up an unfinished job so any process can claim it straight away."""
+    with engine.begin() as conn:
+        conn.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.id == job_id, ScrapeJob.claimed_by == holder)
+            .values(claimed_by=None, lease_expires_at=None)
+        )
+
+
+def claim_next_job(holder: str):
+    """Claim the oldest unclaimed (or abandoned) active job for holder and return its id, or None."""
+    db = SessionLocal()
+    try:
+        candidates = [
+            row.id
+            for row in db.query(ScrapeJob.id)
+            .filter(
+                ScrapeJob.status.in_(ACTIVE_STATUSES),
+                or_(ScrapeJob.claimed_by.is_(None), ScrapeJob.lease_expires_at < leases.utcnow()),
+            )
+            .order_by(ScrapeJob.created_at, ScrapeJob.id)
+            .limit(20)
+        ]
+    finally:
+        db.close()
+    for job_id in candidates:
+        if claim_job(job_id, holder):
+            return job_id
+    return None
+
+
+def run_job(job_id: int, holder: str = None):
+    """Scrape the students of a job's category, recording progress as it goes.
+
+    The job is claimed first, unless the caller passes the holder token it
+    already claimed it with, and runs while holding its category's fetch
+    lease, so no other job or synchronous fetch scrapes the same students at
+    once. Both are renewed by a heartbeat; if either is lost the job stops
+    without writing further results and its claim is released.
+
+    Students that already have an item for this job are skipped, so a job that
+    was interrupted by a restart picks up where it left off. The job's max_age
+    and budget limits are applied on every (re)start, and a scheduled job
+    never scrapes more than the total it was created with.
+    """
+    if holder is None:
+        holder = leases.new_token()
+        if not claim_job(job_id, holder):
+            return
+    elif not renew_claim(job_id, holder):
+        # The claim lapsed before the job started and someone else has it now
+        return
+    heartbeat = leases.Heartbeat(lambda: renew_claim(job_id, holder)).start()
+    lease = None
+    db = SessionLocal()
+    try:
+        job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+        if not job or job.status not in ACTIVE_STATUSES:
+            return
+
+        lease = leases.fetch_lease_name(job.requested_by, job.category)
+        while not leases.acquire(lease, holder):
+            heartbeat.check()
+            time.sleep(LEASE_RETRY_INTERVAL)
+        heartbeat.renewals.append(lambda: leases.renew(lease, holder))
+
+        done_ids = {
+            row.student_id
+            for row in db.query(ScrapeJobItem.student_id).filter(ScrapeJobItem.job_id == job.id)
+        }
+        students = [
+            s
+            for s in select_students_for_refresh(db, job.requested_by, job.category, job.max_age)
+            if s.id not in done_ids
+        ]
+        if job.scheduled:
+            # A scheduled job refreshes only the share its round gave it
+            students = students[:max(job.total - len(done_ids), 0)]
+
+        job.status = "running"
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        job.total = len(done_ids) + len(students)
+        db.commit()
+
+        # Student rows, their items, snapshots and stats deltas are committed
+        # together a batch at a time, so a run that stops part way leaves no
+        # student half-recorded; a resumed run redoes the uncommitted batch.
+        # The scrape runs on its own thread and hands results over through a
+        # queue, so its event loop never waits on these writes.
+        snapshots = []
+        changes = []
+        last_commit = time.monotonic()
+
+        def flush_batch():
+            nonlocal last_commit
+            heartbeat.check()
+            record_snapshots(db, snapshots)
+            update_stats(db, job.requested_by, job.category, changes)
+            db.commit()
+            snapshots.clear()
+            changes.clear()
+            last_commit = time.monotonic()
+
+        def record_result(index, scraped):
+            heartbeat.check()
+            student = students[index]
+            before = apply_scrape_result(student, scraped)
+            after = student_to_dict(student)
+            if student.last_fetched != before["last_fetched"]:
+                snapshots.append(snapshot_values(student))
+            changes.append((before, after))
+            failures = scrape_failures(scraped)
+            db.add(
+                ScrapeJobItem(
+                    job_id=job.id,
+                    student_id=student.id,
+                    ok=not failures,
+                    error=f"Lookup failed: {', '.join(failures)}" if failures else None,
+                    result=json.dumps(after),
+                )
+            )
+            if failures:
+                job.failed += 1
+            else:
+                job.completed += 1
+            if len(changes) >= SNAPSHOT_BATCH_SIZE or time.monotonic() - last_commit >= JOB_COMMIT_INTERVAL:
+                flush_batch()
+
+        pairs = [(s.leetcode_url, s.hackerrank_url) for s in students]
+        job.requests_saved = (job.requests_saved or 0) + duplicate_lookups(pairs)
+        db.commit()
+
+        budget = ScrapeBudget(job.time_budget, job.max_requests)
+        results = queue.Queue()
+        outcome = {}
+
+        def scrape():
+            try:
+                outcome["scraped"] = scrape_students_data(
+                    pairs, on_result=lambda index, scraped: results.put((index, scraped)), budget=budget
+                )
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                results.put(None)
+
+        scrape_thread = threading.Thread(target=scrape, name=f"scrape-job-{job_id}", daemon=True)
+        scrape_thread.start()
+        try:
+            while True:
+                try:
+                    result = results.get(timeout=JOB_COMMIT_INTERVAL)
+                except queue.Empty:
+                    if changes:
+                        flush_batch()
+                    continue
+                if result is None:
+                    break
+                record_result(*result)
+        finally:
+            # If recording stopped early, start no more students and let the
+            # ones in flight finish before the session is closed
+            budget.stop()
+            scrape_thread.join()
+        if "error" in outcome:
+            raise outcome["error"]
+        scraped_all = outcome["scraped"]
+
+        flush_batch()
+        prune_snapshots(db, student_filters(job.requested_by, job.category))
+        job.skipped = sum(1 for scraped in scraped_all if scraped is None)
+        job.status = "completed"
+        job.finished_at = datetime.now(timezone.utc)
+        job.lease_expires_at = None
+        db.commit()
+    except leases.LeaseLost as e:
+        db.rollback()
+        release_claim(job_id, holder)
+        print(f"Scrape job {job_id} stopped: {e}")
+    except Exception as e:
+        db.rollback()
+        job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id).first()
+        if job:
+            job.status = "failed"
+            job.error = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+            job.lease_expires_at = None
+            db.commit()
+        print(f"Scrape job {job_id} failed: {e}")
+    finally:
+        heartbeat.stop()
+        if lease:
+            leases.release(lease, holder)
+        db.close()
+
+
+def shutdown():
+    _stop_polling.set()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+
+
+def job_to_dict(db, job: ScrapeJob, after: int = 0) -> dict:
+    """Serialize a job with its per-student items newer than item id `after`."""
+    items = (
+        db.query(ScrapeJobItem)
+        .filter(ScrapeJobItem.job_id == job.id, ScrapeJobItem.id > after)
+        .order_by(ScrapeJobItem.id)
+        .all()
+    )
+    return {
+        "id": job.id,
+        "category": job.category,
+        "status": job.status,
+        "total": job.total,
+        "completed": job.completed,
+        "failed": job.failed,
+        "skipped": job.skipped,
+        "requests_saved": job.requests_saved,
+        "scheduled": bool(job.scheduled),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "results": [
+            {
+                "item_id": item.id,
+                "student_id": item.student_id,
+                "ok": item.ok,
+                "error": item.error,
+                "student": json.loads(item.result) if item.result else None,
+            }
+            for item in items
+        ],
+    }
@@ -0,0 +1,140 @@
+"""Database-backed leases that let several API and worker processes share work.
+
+A lease is a row in the leases table naming its holder and an expiry time.
+It is taken with a conditional UPDATE (or an INSERT for a new name), so at
+most one holder has a name at a time on SQLite and PostgreSQL alike, and a
+holder that dies simply lets its lease expire. Holders renew their leases
+from a Heartbeat thread while they work.
+
+A holder is a token from new_token(), one per acquisition rather than per
+process, so threads of the same process exclude each other too.
+"""
+import os
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import engine
+from models import Lease
+
+
+# Seconds a lease or job claim lasts unless its holder renews it
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS", "120"))
+
+
+class LeaseBusy(Exception):
+    """Raised when a lease is held by another holder."""
+
+
+class LeaseLost(Exception):
+    """Raised when a renewal finds that a lease has passed to another holder."""
+
+
+def worker_id() -> str:
+    """Identify this process; computed per call so forked workers differ."""
+    return os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def new_token() -> str:
+    """A holder token for one acquisition, readable as the process it came from."""
+    return f"{worker_id()}:{uuid.uuid4().hex[:12]}"
+
+
+def utcnow() -> datetime:
+    # DateTime columns are stored as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def fetch_lease_name(user_id: int, category: str) -> str:
+    """The lease held while a user's category is being scraped."""
+    return f"fetch:{user_id}:{category}"
+
+
+def acquire(name: str, holder: str, seconds: int = LEASE_SECONDS) -> bool:
+    """Take or extend the lease on name for holder; False if someone else holds it."""
+    now = utcnow()
+    expires_at = now + timedelta(seconds=seconds)
+    with engine.begin() as conn:
+        taken = conn.execute(
+            update(Lease)
+            .where(Lease.name == name, or_(Lease.holder == holder, Lease.expires_at < now))
+            .values(holder=holder, expires_at=expires_at)
+        ).rowcount
+    if taken:
+        return True
+    try:
+        with engine.begin() as conn:
+            conn.execute(insert(Lease).values(name=name, holder=holder, expires_at=expires_at))
+        return True
+    except IntegrityError:
+        return False
+
+
+def renew(name: str, holder: str, seconds: int = LEASE_SECONDS) -> bool:
+    """Extend a lease holder has; False if it has lost it."""
+    with engine.begin() as conn:
+        return bool(
+            conn.execute(
+                update(Lease)
+                .where(Lease.name == name, Lease.holder == holder)
+                .values(expires_at=utcnow() + timedelta(seconds=seconds))
+            ).rowcount
+        )
+
+
+def release(name: str, holder: str):
+    with engine.begin() as conn:
+        conn.execute(delete(Lease).where(Lease.name == name, Lease.holder == holder))
+
+
+class Heartbeat:
+    """Calls renewal functions every third of LEASE_SECONDS on a daemon thread.
+
+    Each function returns False once its lease is lost; lost is then set and
+    check() raises LeaseLost, so the holder can stop before writing more.
+    """
+
+    def __init__(self, *renewals):
+        self.renewals = list(renewals)
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(LEASE_SECONDS / 3):
+            for renewal in list(self.renewals):
+                try:
+                    if not renewal():
+                        self.lost.set()
+                except Exception as e:
+                    print(f"Error renewing lease: {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self):
+        if self.lost.is_set():
+            raise LeaseLost("lease expired or was taken over by another holder")
+
+
+@contextmanager
+def holding(name: str):
+    """Hold the lease on name for the block, renewing it; raises LeaseBusy if taken."""
+    token = new_token()
+    if not acquire(name, token):
+        raise LeaseBusy(name)
+    heartbeat = Heartbeat(lambda: renew(name, token)).start()
+    try:
+        yield heartbeat
+    finally:
+        heartbeat.stop()
+        release(name, token)
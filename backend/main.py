@@ -1,25 +1,61 @@
 from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, and_, delete, func, select
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime, timezone
-import openpyxl
-import io
+import asyncio
+import json
 import os
 
-from database import get_db, init_db, engine, Base
-from models import User, Student
+from database import get_async_db, get_db, init_db, engine, async_engine, AsyncSessionLocal, Base, SessionLocal
+from models import User, Student, ScrapeJob
 from auth import (
-    verify_password,
     get_password_hash,
+    get_password_hash_async,
+    needs_rehash,
+    shutdown_hashing,
+    verify_password_async,
     create_access_token,
     decode_access_token,
+    session_cache,
 )
-from scraper import scrape_student_data
+from scraper import ScrapeBudget, duplicate_lookups, scrape_student_data, scrape_students_data
+from refresh import apply_scrape_result, select_students_for_refresh, student_to_dict
+from http_pool import pools
+from rate_limiter import limiter
+from scrape_cache import scrape_cache
+from circuit_breaker import breaker
+from ingest import IngestError, ingest_rows, merge_rows, reader_for
+from export import MEDIA_TYPES, stream_export
+from category_stats import get_stats, rebuild_stats, update_stats
+from snapshots import (
+    delete_snapshots,
+    prune_snapshots,
+    record_snapshots,
+    score_deltas,
+    snapshot_values,
+    weekly_scores,
+)
+from queries import (
+    SORT_KEYS,
+    decode_cursor,
+    encode_cursor,
+    keyset_after,
+    order_by,
+    search_filter,
+    sort_value,
+    student_filters,
+)
+import jobs
+import leases
+import metrics
+import migrations
+import scheduler
 
 app = FastAPI(title="Coding Retriever", version="1.0.0")
 
@@ -31,6 +67,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
+# Bearer token that lets scrapers read /api/metrics; admins can always read it
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
 
 
 # ─── Pydantic Schemas ───────────────────────────────────────────
@@ -68,23 +111,48 @@ class UserResponse(BaseModel):
 
 
 # ─── Helpers ─────────────────────────────────────────────────────
-def get_current_user(authorization: str = Header(None), db: Session = Depends(get_db)):
+# Routes declared `async def` use get_async_db; plain `def` routes (uploads,
+# scrapes, exports) run in the threadpool and use the sync get_db.
+async def get_current_user(authorization: str = Header(None)):
+    """The user of the request's bearer token.
+
+    The returned User is detached from any session; routes that modify it
+    add it to their own session first. The database is only read when the
+    token isn't in the session cache, through a session of its own that is
+    closed before the route runs, so sync routes don't hold a second
+    connection for the whole request.
+    """
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
     token = authorization.split(" ")[1]
+
+    cached = session_cache.get(token)
+    if cached is not None:
+        # Rebuild the user from the snapshot without a query
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return user
+
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
-    user = db.query(User).filter(User.username == payload.get("sub")).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
+    async with AsyncSessionLocal() as db:
+        user = await db.scalar(select(User).where(User.username == payload.get("sub")))
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        db.expunge(user)
+    session_cache.set(
+        token,
+        payload.get("exp"),
+        {column.key: getattr(user, column.key) for column in User.__table__.columns},
+    )
     return user
 
 
 # ─── Startup ─────────────────────────────────────────────────────
 @app.on_event("startup")
 def startup():
-    Base.metadata.create_all(bind=engine)
+    migrations.check_schema()
     db = next(get_db())
     # Create default admin if not exists
     admin = db.query(User).filter(User.username == "Admin@AI").first()
@@ -97,15 +165,33 @@ def startup():
         db.add(admin)
         db.commit()
     db.close()
+    # Also picks up jobs left queued or running by a previous process
+    jobs.start_polling()
+    if scheduler.SCHEDULER_ENABLED:
+        scheduler.start()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    scheduler.stop()
+    jobs.shutdown()
+    shutdown_hashing()
+    pools.close()
 
 
 # ─── Auth Routes ─────────────────────────────────────────────────
 @app.post("/api/auth/login")
-def login(req: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == req.username).first()
-    if not user or not verify_password(req.password, user.password_hash):
+async def login(req: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.username == req.username))
+    if not user or not await verify_password_async(req.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    # Upgrade hashes made with an older cost factor while we have the password
+    if needs_rehash(user.password_hash):
+        user.password_hash = await get_password_hash_async(req.password)
+        await db.commit()
+        session_cache.invalidate_user(user.id)
+
     token = create_access_token(data={"sub": user.username, "is_admin": user.is_admin})
     return {
         "access_token": token,
@@ -123,70 +209,71 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 
 
 @app.post("/api/auth/create-account")
-def create_account(
+async def create_account(
     req: CreateAccountRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Only admin can create accounts")
 
-    existing = db.query(User).filter(User.username == req.username).first()
+    existing = await db.scalar(select(User).where(User.username == req.username))
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
 
     new_user = User(
         username=req.username,
-        password_hash=get_password_hash(req.password),
+        password_hash=await get_password_hash_async(req.password),
         is_admin=False,
     )
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return {"message": "Account created successfully", "username": req.username}
 
 
 @app.get("/api/admin/users", response_model=List[UserResponse])
-def list_users(
-    db: Session = Depends(get_db),
+async def list_users(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
-    return db.query(User).all()
+    return (await db.scalars(select(User))).all()
 
 
 @app.put("/api/admin/users/{user_id}")
-def update_user(
+async def update_user(
     user_id: int,
     req: UpdateUserRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    user_to_update = db.query(User).filter(User.id == user_id).first()
+    user_to_update = await db.get(User, user_id)
     if not user_to_update:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Check if new username is taken by someone else
     if req.username != user_to_update.username:
-        existing = db.query(User).filter(User.username == req.username).first()
+        existing = await db.scalar(select(User).where(User.username == req.username))
         if existing:
             raise HTTPException(status_code=400, detail="Username already taken")
         user_to_update.username = req.username
     
     if req.password:
-        user_to_update.password_hash = get_password_hash(req.password)
+        user_to_update.password_hash = await get_password_hash_async(req.password)
         
-    db.commit()
+    await db.commit()
+    session_cache.invalidate_user(user_id)
     return {"message": "User updated successfully"}
 
 
 @app.delete("/api/admin/users/{user_id}")
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     if not current_user.is_admin:
@@ -195,18 +282,42 @@ def delete_user(
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
         
-    user_to_delete = db.query(User).filter(User.id == user_id).first()
+    user_to_delete = await db.get(User, user_id)
     if not user_to_delete:
         raise HTTPException(status_code=404, detail="User not found")
         
-    db.delete(user_to_delete)
-    db.commit()
+    await db.delete(user_to_delete)
+    await db.commit()
+    session_cache.invalidate_user(user_id)
     return {"message": "User deleted successfully"}
 
 
+@app.get("/api/admin/scraper/stats")
+async def scraper_stats(current_user: User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return {
+        "rate_limiter": limiter.stats(),
+        "cache": scrape_cache.stats(),
+        "circuits": breaker.stats(),
+        "connections": pools.stats(),
+        "sessions": session_cache.stats(),
+    }
+
+
+@app.get("/api/admin/scheduler")
+async def scheduler_status(
+    current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)
+):
+    """Persisted progress of the background refresh scheduler."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return await db.run_sync(scheduler.status)
+
+
 # ─── Profile Routes ─────────────────────────────────────────────
 @app.get("/api/profile")
-def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(current_user: User = Depends(get_current_user)):
     return {
         "id": current_user.id,
         "username": current_user.username,
@@ -219,89 +330,52 @@ def get_profile(current_user: User = Depends(get_current_user)):
 
 
 @app.post("/api/profile/change-password")
-def change_password(
+async def change_password(
     req: ChangePasswordRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
-    if not verify_password(req.current_password, current_user.password_hash):
+    # current_user may come from the session cache; check the stored hash
+    user = await db.get(User, current_user.id)
+    if not user or not await verify_password_async(req.current_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
 
-    current_user.password_hash = get_password_hash(req.new_password)
-    db.commit()
+    user.password_hash = await get_password_hash_async(req.new_password)
+    await db.commit()
+    session_cache.invalidate_user(current_user.id)
     return {"message": "Password changed successfully"}
 
 
 # ─── Upload Routes ───────────────────────────────────────────────
 @app.post("/api/upload/{category}")
-async def upload_excel(
+def upload_excel(
     category: str,
     file: UploadFile = File(...),
+    mode: str = Query("merge", description="'merge' keeps scraped stats for unchanged roll numbers; 'replace' reloads the whole roster"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
         raise HTTPException(status_code=400, detail="Category must be 1st, 2nd, 3rd, or 4th year")
 
-    if not file.filename.endswith((".xlsx", ".xls")):
-        raise HTTPException(status_code=400, detail="Only Excel files (.xlsx, .xls) are allowed")
+    if mode not in ("merge", "replace"):
+        raise HTTPException(status_code=400, detail="Mode must be 'merge' or 'replace'")
 
-    try:
-        contents = await file.read()
-        workbook = openpyxl.load_workbook(io.BytesIO(contents))
-        sheet = workbook.active
-
-        # Find column indices from header row
-        headers = {}
-        for col_idx, cell in enumerate(sheet[1], 1):
-            if cell.value:
-                header_lower = str(cell.value).strip().lower()
-                if "name" in header_lower and "roll" not in header_lower:
-                    headers["name"] = col_idx
-                elif "roll" in header_lower:
-                    headers["roll_number"] = col_idx
-                elif "leetcode" in header_lower:
-                    headers["leetcode_url"] = col_idx
-                elif "hackerrank" in header_lower or "hacker" in header_lower:
-                    headers["hackerrank_url"] = col_idx
-
-        required = ["name", "roll_number"]
-        for req_field in required:
-            if req_field not in headers:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Column '{req_field}' not found. Expected columns: Name, Roll Number, Leetcode Profile URL, HackerRank URL",
-                )
-
-        # Delete existing data for this category uploaded by this user
-        db.query(Student).filter(
-            Student.category == category,
-            Student.uploaded_by == current_user.id,
-        ).delete()
-        db.commit()
+    read_rows = reader_for(file.filename)
+    if not read_rows:
+        raise HTTPException(
+            status_code=400,
+            detail="Only Excel (.xlsx, .xls), CSV (.csv) or Parquet (.parquet) files are allowed",
+        )
 
-        students_added = 0
-        for row in sheet.iter_rows(min_row=2, values_only=False):
-            name_val = row[headers["name"] - 1].value
-            if not name_val:
-                continue
-
-            roll_val = row[headers["roll_number"] - 1].value or ""
-            leetcode_val = row[headers.get("leetcode_url", 0) - 1].value if headers.get("leetcode_url") else ""
-            hackerrank_val = row[headers.get("hackerrank_url", 0) - 1].value if headers.get("hackerrank_url") else ""
-
-            student = Student(
-                name=str(name_val).strip(),
-                roll_number=str(roll_val).strip(),
-                leetcode_url=str(leetcode_val).strip() if leetcode_val else "",
-                hackerrank_url=str(hackerrank_val).strip() if hackerrank_val else "",
-                category=category,
-                uploaded_by=current_user.id,
-            )
-            db.add(student)
-            students_added += 1
+    try:
+        # UploadFile is already spooled to disk past a small size, so the
+        # roster is streamed from it rather than read into memory
+        ingest = merge_rows if mode == "merge" else ingest_rows
+        report = ingest(db, read_rows(file.file), category, current_user.id)
 
         # Update user upload status
+        db.add(current_user)
         if category == "1st_year":
             current_user.has_uploaded_1st_year = True
         elif category == "2nd_year":
@@ -311,81 +385,152 @@ async def upload_excel(
         elif category == "4th_year":
             current_user.has_uploaded_4th_year = True
 
+        rebuild_stats(db, current_user.id, category)
         db.commit()
-        return {"message": f"Successfully uploaded {students_added} students for {category}", "count": students_added}
+        session_cache.invalidate_user(current_user.id)
+
+        file_format = os.path.splitext(file.filename)[1].lstrip(".").lower()
+        metrics.INGEST_SECONDS.observe(report["seconds"], format=file_format, mode=mode)
+        metrics.INGEST_ROWS.inc(report["count"], format=file_format)
 
-    except HTTPException:
-        raise
+        students_added = report["count"]
+        return {"message": f"Successfully uploaded {students_added} students for {category}", **report}
+
+    except IngestError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 
 # ─── Student Data Routes ────────────────────────────────────────
 @app.get("/api/students/{category}")
-def get_students(
+async def get_students(
     category: str,
-    db: Session = Depends(get_db),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; omit to return every match"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    sort: str = Query("roll_number", pattern=f"^({'|'.join(SORT_KEYS)})$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    search: Optional[str] = Query(None, description="Substring of name or roll number"),
+    min_lc: Optional[int] = Query(None),
+    min_java: Optional[int] = Query(None),
+    min_python: Optional[int] = Query(None),
+    min_c: Optional[int] = Query(None),
+    min_sql: Optional[int] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
+    """List a category's students, filtered, sorted and keyset-paginated in SQL."""
     if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
         raise HTTPException(status_code=400, detail="Invalid category")
 
-    students = (
-        db.query(Student)
-        .filter(Student.category == category, Student.uploaded_by == current_user.id)
-        .order_by(Student.roll_number)
-        .all()
-    )
+    criteria = student_filters(current_user.id, category, min_lc, min_java, min_python, min_c, min_sql)
+    if search and search.strip():
+        criteria.append(search_filter(search))
 
-    return {
-        "students": [
-            {
-                "id": s.id,
-                "name": s.name,
-                "roll_number": s.roll_number,
-                "leetcode_url": s.leetcode_url,
-                "hackerrank_url": s.hackerrank_url,
-                "leetcode_solved": s.leetcode_solved,
-                "hr_java_stars": s.hr_java_stars,
-                "hr_python_stars": s.hr_python_stars,
-                "hr_c_stars": s.hr_c_stars,
-                "hr_sql_stars": s.hr_sql_stars,
-                "last_fetched": s.last_fetched.isoformat() if s.last_fetched else None,
-            }
-            for s in students
-        ],
+    # Both counts in one query: the category's students, and those matching the filters
+    total, filtered_total = (
+        await db.execute(
+            select(func.count(Student.id), func.count(Student.id).filter(and_(*criteria)))
+            .where(*student_filters(current_user.id, category))
+        )
+    ).one()
+
+    statement = select(Student).where(*criteria)
+    if cursor:
+        try:
+            value, last_id = decode_cursor(cursor, sort, order)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        statement = statement.where(keyset_after(sort, order, value, last_id))
+    statement = statement.order_by(*order_by(sort, order))
+
+    if limit:
+        # Fetch one extra row to know whether another page exists
+        students = (await db.scalars(statement.limit(limit + 1))).all()
+        has_more = len(students) > limit
+        students = students[:limit]
+    else:
+        students = (await db.scalars(statement)).all()
+        has_more = False
+
+    next_cursor = None
+    if has_more:
+        last = students[-1]
+        next_cursor = encode_cursor(sort, order, sort_value(last, sort), last.id)
+
+    # Every value is already a JSON type, so skip jsonable_encoder's walk over
+    # each field of each student; it cost more than the queries
+    return JSONResponse({
+        "students": [student_to_dict(s) for s in students],
         "count": len(students),
-    }
+        "total": total,
+        "filtered_total": filtered_total,
+        "next_cursor": next_cursor,
+    })
 
 
 @app.post("/api/students/fetch/{category}")
 def fetch_student_data(
     category: str,
+    max_age: Optional[int] = Query(None, ge=0, description="Only refresh students not fetched within this many seconds"),
+    time_budget: Optional[int] = Query(None, gt=0, description="Stop starting new students after this many seconds"),
+    max_requests: Optional[int] = Query(None, gt=0, description="Stop starting new students after this many upstream requests"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Scrape LeetCode and HackerRank data for all students in a category."""
+    """Scrape LeetCode and HackerRank data for the students in a category.
+
+    By default every student is scraped. With max_age only stale or
+    never-fetched students are, oldest first, until the budget runs out.
+    """
     if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
         raise HTTPException(status_code=400, detail="Invalid category")
 
-    students = (
-        db.query(Student)
-        .filter(Student.category == category, Student.uploaded_by == current_user.id)
-        .all()
-    )
+    # Refresh jobs and other workers' fetches of this category hold the same lease
+    try:
+        with leases.holding(leases.fetch_lease_name(current_user.id, category)):
+            return scrape_category(db, current_user.id, category, max_age, time_budget, max_requests)
+    except leases.LeaseBusy:
+        raise HTTPException(status_code=409, detail="A refresh of this category is already running")
+
+
+def scrape_category(
+    db: Session,
+    user_id: int,
+    category: str,
+    max_age: Optional[int],
+    time_budget: Optional[int],
+    max_requests: Optional[int],
+) -> dict:
+    students = select_students_for_refresh(db, user_id, category, max_age)
 
     if not students:
-        raise HTTPException(status_code=404, detail="No students found for this category")
+        has_students = (
+            db.query(Student.id)
+            .filter(Student.category == category, Student.uploaded_by == user_id)
+            .first()
+        )
+        if not has_students:
+            raise HTTPException(status_code=404, detail="No students found for this category")
+        return {"message": "All students are up to date", "results": [], "skipped": 0, "requests_saved": 0}
+
+    pairs = [(student.leetcode_url, student.hackerrank_url) for student in students]
+    scraped_all = scrape_students_data(pairs, budget=ScrapeBudget(time_budget, max_requests))
 
     results = []
-    for student in students:
-        scraped = scrape_student_data(student.leetcode_url, student.hackerrank_url)
-        student.leetcode_solved = scraped["leetcode_solved"]
-        student.hr_java_stars = scraped["hr_java_stars"]
-        student.hr_python_stars = scraped["hr_python_stars"]
-        student.hr_c_stars = scraped["hr_c_stars"]
-        student.hr_sql_stars = scraped["hr_sql_stars"]
-        student.last_fetched = datetime.now(timezone.utc)
+    snapshots = []
+    changes = []
+    skipped = 0
+    for student, scraped in zip(students, scraped_all):
+        if scraped is None:
+            skipped += 1
+            continue
+        before = apply_scrape_result(student, scraped)
+        if student.last_fetched != before["last_fetched"]:
+            snapshots.append(snapshot_values(student))
+        changes.append((before, student_to_dict(student)))
         results.append(
             {
                 "id": student.id,
@@ -398,8 +543,16 @@ def fetch_student_data(
             }
         )
 
+    record_snapshots(db, snapshots)
+    prune_snapshots(db, student_filters(user_id, category))
+    update_stats(db, user_id, category, changes)
     db.commit()
-    return {"message": f"Fetched data for {len(results)} students", "results": results}
+    return {
+        "message": f"Fetched data for {len(results)} students",
+        "results": results,
+        "skipped": skipped,
+        "requests_saved": duplicate_lookups(pairs),
+    }
 
 
 @app.post("/api/students/fetch-single/{student_id}")
@@ -413,45 +566,118 @@ def fetch_single_student(
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
 
-    scraped = scrape_student_data(student.leetcode_url, student.hackerrank_url)
-    student.leetcode_solved = scraped["leetcode_solved"]
-    student.hr_java_stars = scraped["hr_java_stars"]
-    student.hr_python_stars = scraped["hr_python_stars"]
-    student.hr_c_stars = scraped["hr_c_stars"]
-    student.hr_sql_stars = scraped["hr_sql_stars"]
-    student.last_fetched = datetime.now(timezone.utc)
-    db.commit()
-
-    return {
-        "id": student.id,
-        "name": student.name,
-        "roll_number": student.roll_number,
-        "leetcode_url": student.leetcode_url,
-        "hackerrank_url": student.hackerrank_url,
-        "leetcode_solved": student.leetcode_solved,
-        "hr_java_stars": student.hr_java_stars,
-        "hr_python_stars": student.hr_python_stars,
-        "hr_c_stars": student.hr_c_stars,
-        "hr_sql_stars": student.hr_sql_stars,
-        "last_fetched": student.last_fetched.isoformat() if student.last_fetched else None,
-    }
-
-
-@app.delete("/api/students/{category}")
-def delete_category_data(
+    try:
+        with leases.holding(leases.fetch_lease_name(current_user.id, student.category)):
+            scraped = scrape_student_data(student.leetcode_url, student.hackerrank_url)
+            before = apply_scrape_result(student, scraped)
+            if student.last_fetched != before["last_fetched"]:
+                record_snapshots(db, [snapshot_values(student)])
+            update_stats(db, current_user.id, student.category, [(before, student_to_dict(student))])
+            db.commit()
+    except leases.LeaseBusy:
+        raise HTTPException(status_code=409, detail="A refresh of this student's category is running")
+
+    return student_to_dict(student)
+
+
+# ─── Refresh Job Routes ─────────────────────────────────────────
+@app.post("/api/jobs/fetch/{category}")
+def submit_fetch_job(
     category: str,
+    max_age: Optional[int] = Query(None, ge=0, description="Only refresh students not fetched within this many seconds"),
+    time_budget: Optional[int] = Query(None, gt=0, description="Stop starting new students after this many seconds"),
+    max_requests: Optional[int] = Query(None, gt=0, description="Stop starting new students after this many upstream requests"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    """Queue a background refresh of a category and return its job id."""
     if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
         raise HTTPException(status_code=400, detail="Invalid category")
 
-    deleted = (
+    total = (
         db.query(Student)
         .filter(Student.category == category, Student.uploaded_by == current_user.id)
-        .delete()
+        .count()
     )
+    if not total:
+        raise HTTPException(status_code=404, detail="No students found for this category")
+
+    # Reuse a refresh the user already started rather than scraping twice; a
+    # scheduled job only covers part of the category under tighter limits
+    job = jobs.find_active_job(db, current_user.id, category, scheduled=False)
+    if not job:
+        job = jobs.create_job(db, current_user.id, category, total, max_age, time_budget, max_requests)
+        jobs.submit_job(job.id)
+
+    return {"job_id": job.id, "status": job.status, "total": job.total}
+
+
+def get_user_job(db: Session, job_id: int, user: User) -> ScrapeJob:
+    job = db.query(ScrapeJob).filter(ScrapeJob.id == job_id, ScrapeJob.requested_by == user.id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(
+    job_id: int,
+    after: int = Query(0, description="Only return results with an item_id greater than this"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    def load(sync_db):
+        return jobs.job_to_dict(sync_db, get_user_job(sync_db, job_id, current_user), after=after)
+
+    return await db.run_sync(load)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+):
+    """Server-sent events stream of job progress until the job finishes."""
 
+    def load(after):
+        db = SessionLocal()
+        try:
+            return jobs.job_to_dict(db, get_user_job(db, job_id, current_user), after=after)
+        finally:
+            db.close()
+
+    # Fail with a normal 404 before the stream starts
+    snapshot = await asyncio.to_thread(load, 0)
+
+    async def events(snapshot):
+        after = 0
+        while True:
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot["status"] not in jobs.ACTIVE_STATUSES:
+                return
+            if snapshot["results"]:
+                after = snapshot["results"][-1]["item_id"]
+            await asyncio.sleep(1)
+            snapshot = await asyncio.to_thread(load, after)
+
+    return StreamingResponse(events(snapshot), media_type="text/event-stream")
+
+
+@app.delete("/api/students/{category}")
+async def delete_category_data(
+    category: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
+        raise HTTPException(status_code=400, detail="Invalid category")
+
+    criteria = student_filters(current_user.id, category)
+    await db.run_sync(delete_snapshots, criteria)
+    result = await db.execute(delete(Student).where(*criteria))
+    deleted = result.rowcount
+
+    db.add(current_user)
     if category == "1st_year":
         current_user.has_uploaded_1st_year = False
     elif category == "2nd_year":
@@ -461,7 +687,9 @@ def delete_category_data(
     elif category == "4th_year":
         current_user.has_uploaded_4th_year = False
 
-    db.commit()
+    await db.run_sync(rebuild_stats, current_user.id, category)
+    await db.commit()
+    session_cache.invalidate_user(current_user.id)
     return {"message": f"Deleted {deleted} students from {category}"}
 
 
@@ -473,87 +701,105 @@ def export_category_data(
     min_python: Optional[int] = Query(None),
     min_c: Optional[int] = Query(None),
     min_sql: Optional[int] = Query(None),
+    format: str = Query(
+        "xlsx",
+        pattern="^(xlsx|csv)$",
+        description="xlsx is built on disk and sent once complete; csv is sent as rows are read",
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
         raise HTTPException(status_code=400, detail="Invalid category")
 
-    query = db.query(Student).filter(
-        Student.category == category, 
-        Student.uploaded_by == current_user.id
-    )
-
-    # Apply filters if provided
-    if min_lc is not None:
-        query = query.filter(Student.leetcode_solved >= min_lc)
-    if min_java is not None:
-        query = query.filter(Student.hr_java_stars >= min_java)
-    if min_python is not None:
-        query = query.filter(Student.hr_python_stars >= min_python)
-    if min_c is not None:
-        query = query.filter(Student.hr_c_stars >= min_c)
-    if min_sql is not None:
-        query = query.filter(Student.hr_sql_stars >= min_sql)
-
-    students = query.order_by(Student.roll_number).all()
+    criteria = student_filters(current_user.id, category, min_lc, min_java, min_python, min_c, min_sql)
 
-    if not students:
+    if not db.query(Student.id).filter(*criteria).first():
         raise HTTPException(status_code=404, detail="No data matching filters to export")
 
-    # Create Excel Workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = f"{category.replace('_', ' ').title()} Data"
-
-    # Define headers
-    headers = [
-        "S.No", 
-        "Name", 
-        "Roll Number", 
-        "LeetCode Solved", 
-        "Java Stars", 
-        "Python Stars", 
-        "C Stars", 
-        "SQL Stars",
-        "LeetCode URL",
-        "HackerRank URL"
-    ]
-    ws.append(headers)
-
-    # Add data
-    for idx, s in enumerate(students, 1):
-        ws.append([
-            idx,
-            s.name,
-            s.roll_number,
-            s.leetcode_solved,
-            s.hr_java_stars,
-            s.hr_python_stars,
-            s.hr_c_stars,
-            s.hr_sql_stars,
-            s.leetcode_url,
-            s.hackerrank_url
-        ])
-
-    # Save to buffer
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    filename = f"{category}_coding_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
+    filename = f"{category}_coding_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+
     return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        stream_export(format, criteria, category),
+        media_type=MEDIA_TYPES[format],
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 
+@app.get("/api/stats/{category}")
+async def get_category_stats(
+    category: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Counts, LeetCode distribution, star distribution and leaderboard of a category."""
+    if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
+        raise HTTPException(status_code=400, detail="Invalid category")
+
+    return await db.run_sync(get_stats, current_user.id, category)
+
+
+# ─── Trend Routes ───────────────────────────────────────────────
+@app.get("/api/trends/{category}")
+async def get_category_trends(
+    category: str,
+    days: int = Query(30, ge=1, le=366, description="Measure progress over this many days"),
+    weeks: int = Query(12, ge=1, le=53, description="Weekly averages for this many weeks"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Only the students with the most progress"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Per-student score changes over `days` and per-week category averages."""
+    if category not in ("1st_year", "2nd_year", "3rd_year", "4th_year"):
+        raise HTTPException(status_code=400, detail="Invalid category")
+
+    criteria = student_filters(current_user.id, category)
+    return {
+        "days": days,
+        "students": await db.run_sync(score_deltas, criteria, days, limit),
+        "weekly": await db.run_sync(weekly_scores, criteria, weeks),
+    }
+
+
+@app.get("/api/trends/student/{student_id}")
+async def get_student_trend(
+    student_id: int,
+    days: int = Query(30, ge=1, le=366, description="Measure progress over this many days"),
+    weeks: int = Query(12, ge=1, le=53, description="Weekly scores for this many weeks"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """One student's score change over `days` and best score per week."""
+    criteria = [Student.id == student_id, Student.uploaded_by == current_user.id]
+    deltas = await db.run_sync(score_deltas, criteria, days)
+    if not deltas:
+        raise HTTPException(status_code=404, detail="Student not found")
+
+    return {
+        "days": days,
+        **deltas[0],
+        "weekly": [
+            {key: value for key, value in week.items() if key != "students"}
+            for week in await db.run_sync(weekly_scores, criteria, weeks)
+        ],
+    }
+
+
 @app.get("/api/health")
 def health_check():
     return {"status": "ok", "message": "Coding Retriever API is running"}
 
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics(authorization: str = Header(None)):
+    """Request, upstream, scraper, database and file-processing metrics in Prometheus text format."""
+    if not (METRICS_TOKEN and authorization == f"Bearer {METRICS_TOKEN}"):
+        current_user = await get_current_user(authorization)
+        if not current_user.is_admin:
+            raise HTTPException(status_code=403, detail="Admin access required")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 # ─── Static File Serving (Production) ───────────────────────
 # Mount the frontend's 'dist' folder (created after 'npm run build')
 frontend_dist_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend", "dist")
@@ -0,0 +1,237 @@
+"""In-process counters and histograms rendered in the Prometheus text format.
+
+Metrics are module-level objects updated on the hot path, so updating one
+is a dict lookup and an addition under a lock. /api/metrics renders them:
+
+    http_request_duration_seconds    per method, route template and status
+    upstream_request_duration_seconds per platform and response status
+    scraper_lookups_total            per platform and outcome
+    scraper_circuit_state            per platform (0 closed, 1 half-open, 2 open)
+    scrape_cache_lookups_total       per result (hit, stale, negative, miss)
+    db_query_duration_seconds        per statement type
+    ingest_duration_seconds          per roster format and upload mode
+    export_duration_seconds          per export format
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import event
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# For whole-file operations such as ingest and export
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {values[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "API request latency.", ("method", "route", "status")
+)
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_duration_seconds", "LeetCode and HackerRank request latency.", ("platform", "status")
+)
+SCRAPER_LOOKUPS = Counter(
+    "scraper_lookups_total",
+    "Profile lookups by result: ok, not_found, none (bad response), error (exception) or rejected (circuit open).",
+    ("platform", "outcome"),
+)
+CIRCUIT_STATE = Gauge(
+    "scraper_circuit_state", "Upstream circuit breaker state: 0 closed, 1 half-open, 2 open.", ("platform",)
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "scraper_circuit_transitions_total", "Circuit breaker state changes by new state.", ("platform", "state")
+)
+SCRAPE_CACHE_LOOKUPS = Counter(
+    "scrape_cache_lookups_total", "Scrape cache lookups by result: hit, stale, negative or miss.", ("result",)
+)
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "Database statement latency.", ("statement",))
+INGEST_SECONDS = Histogram(
+    "ingest_duration_seconds", "Roster upload processing time.", ("format", "mode"), SLOW_BUCKETS
+)
+INGEST_ROWS = Counter("ingest_rows_total", "Roster rows ingested.", ("format",))
+EXPORT_SECONDS = Histogram("export_duration_seconds", "Category export time.", ("format",), SLOW_BUCKETS)
+
+REGISTRY = (
+    REQUEST_SECONDS,
+    UPSTREAM_SECONDS,
+    SCRAPER_LOOKUPS,
+    CIRCUIT_STATE,
+    CIRCUIT_TRANSITIONS,
+    SCRAPE_CACHE_LOOKUPS,
+    DB_QUERY_SECONDS,
+    INGEST_SECONDS,
+    INGEST_ROWS,
+    EXPORT_SECONDS,
+)
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by its route template.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so requests aren't wrapped in
+    an extra task and streaming bodies pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the scope; using its
+            # template keeps ids in paths from creating a series per request
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, method=scope["method"], route=route, status=str(status)
+            )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    if verb not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+        verb = "OTHER"
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement=verb)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine):
+    """Time every statement a (sync) engine executes."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
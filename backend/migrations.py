@@ -0,0 +1,184 @@
+"""Versioned schema migrations.
+
+Each migration is applied once, in order, and the highest applied version is
+recorded in the schema_version table. Startup only reads that version; it
+upgrades automatically unless AUTO_MIGRATE=0, in which case run:
+
+    python migrations.py status
+    python migrations.py upgrade
+
+New migrations are appended to MIGRATIONS with the next version number and
+must be safe to re-run against a database that already has their changes.
+"""
+import os
+import re
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+from database import Base, engine
+import models
+
+
+# Apply pending migrations at startup instead of refusing to start
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes upgrades
+_LOCK_KEY = 7_402_113
+
+
+def create_tables(*model_classes):
+    for model in model_classes:
+        model.__table__.create(bind=engine, checkfirst=True)
+
+
+def create_index(table_name: str, index_name: str):
+    """Create an index declared on a model if it doesn't exist yet.
+
+    On PostgreSQL the index is built CONCURRENTLY, outside a transaction, so
+    writes to the table aren't blocked while it builds.
+    """
+    table = Base.metadata.tables[table_name]
+    index = next(i for i in table.indexes if i.name == index_name)
+
+    if engine.dialect.name != "postgresql":
+        index.create(bind=engine, checkfirst=True)
+        return
+
+    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    sql = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", sql)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(sql))
+
+
+def add_column(table_name: str, column_name: str):
+    """Add a column declared on a model to an existing table if it is missing."""
+    existing = {c["name"] for c in inspect(engine).get_columns(table_name)}
+    if column_name in existing:
+        return
+    column = Base.metadata.tables[table_name].c[column_name]
+    column_type = column.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+
+
+def _initial_tables():
+    create_tables(models.User, models.Student)
+
+
+def _refresh_jobs():
+    create_tables(models.ScrapeJob, models.ScrapeJobItem)
+
+
+def _student_indexes():
+    create_index("students", "ix_students_owner_category_roll")
+    create_index("students", "ix_students_owner_category_fetched")
+
+
+def _score_snapshots():
+    create_tables(models.ScoreSnapshot)
+
+
+def _category_stats():
+    create_tables(models.CategoryStats)
+
+
+def _scheduler():
+    create_tables(models.SchedulerState)
+    add_column("scrape_jobs", "scheduled")
+
+
+def _worker_coordination():
+    create_tables(models.Lease)
+    add_column("scrape_jobs", "claimed_by")
+    add_column("scrape_jobs", "lease_expires_at")
+    create_index("scrape_job_items", "ux_scrape_job_items_job_student")
+
+
+MIGRATIONS = [
+    (1, "users and students tables", _initial_tables),
+    (2, "scrape job tables", _refresh_jobs),
+    (3, "composite student indexes", _student_indexes),
+    (4, "score snapshots table", _score_snapshots),
+    (5, "category stats table", _category_stats),
+    (6, "refresh scheduler state", _scheduler),
+    (7, "leases and job claims", _worker_coordination),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version() -> int:
+    with engine.connect() as conn:
+        try:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except Exception:
+            # No schema_version table yet: a fresh or pre-migrations database
+            return 0
+
+
+def _set_version(version: int):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+
+
+def upgrade() -> list:
+    """Apply every pending migration and return the versions applied."""
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+
+    lock = None
+    if engine.dialect.name == "postgresql":
+        # Several workers may start at once; only one of them migrates
+        lock = engine.connect()
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _LOCK_KEY})
+
+    applied = []
+    try:
+        version = current_version()
+        for number, description, migrate in MIGRATIONS:
+            if number <= version:
+                continue
+            print(f"Applying migration {number}: {description}")
+            migrate()
+            _set_version(number)
+            applied.append(number)
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+            lock.close()
+    return applied
+
+
+def check_schema():
+    """Make sure the database is at LATEST_VERSION, upgrading it if allowed."""
+    version = current_version()
+    if version >= LATEST_VERSION:
+        return
+    if not AUTO_MIGRATE:
+        raise RuntimeError(
+            f"Database schema is at version {version}, expected {LATEST_VERSION}. "
+            "Run 'python migrations.py upgrade'."
+        )
+    upgrade()
+
+
+def main(argv) -> int:
+    command = argv[1] if len(argv) > 1 else "status"
+    if command == "upgrade":
+        applied = upgrade()
+        print(f"Applied {len(applied)} migration(s); schema is at version {current_version()}")
+    elif command == "status":
+        version = current_version()
+        print(f"Schema version {version} of {LATEST_VERSION}")
+        for number, description, _ in MIGRATIONS:
+            print(f"  [{'x' if number <= version else ' '}] {number}: {description}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
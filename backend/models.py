@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Boolean, DateTime, Float, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from database import Base
@@ -34,3 +34,119 @@ class Student(Base):
     hr_sql_stars = Column(Integer, nullable=True)
     last_fetched = Column(DateTime, nullable=True)
     uploaded_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    __table_args__ = (
+        # Every student endpoint filters on owner + category; listing and export
+        # order by roll number. On PostgreSQL the scores ride along in the index
+        # so threshold filters and counts can be answered from it alone.
+        Index(
+            "ix_students_owner_category_roll",
+            "uploaded_by",
+            "category",
+            "roll_number",
+            postgresql_include=[
+                "leetcode_solved",
+                "hr_java_stars",
+                "hr_python_stars",
+                "hr_c_stars",
+                "hr_sql_stars",
+            ],
+        ),
+        # Incremental refreshes pick the stalest students of a category
+        Index("ix_students_owner_category_fetched", "uploaded_by", "category", "last_fetched"),
+    )
+
+
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    category = Column(String, nullable=False)
+    requested_by = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    total = Column(Integer, default=0)
+    completed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)  # left out because the time or request budget ran out
+    requests_saved = Column(Integer, default=0)  # lookups shared between students with the same handle
+    max_age = Column(Integer, nullable=True)  # only refresh students older than this many seconds
+    time_budget = Column(Integer, nullable=True)  # seconds
+    max_requests = Column(Integer, nullable=True)
+    scheduled = Column(Boolean, default=False)  # started by scheduler.py rather than a user
+    claimed_by = Column(String, nullable=True)  # worker running the job, see jobs.claim_job
+    lease_expires_at = Column(DateTime, nullable=True)  # claim lapses unless renewed by then
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ScrapeJobItem(Base):
+    __tablename__ = "scrape_job_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("scrape_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    student_id = Column(Integer, nullable=False)
+    ok = Column(Boolean, default=True)
+    error = Column(String, nullable=True)
+    result = Column(Text, nullable=True)  # JSON snapshot of the student after the scrape
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # A student is recorded at most once per job, however often the job is resumed
+        Index("ux_scrape_job_items_job_student", "job_id", "student_id", unique=True),
+    )
+
+
+class CategoryStats(Base):
+    """Materialized aggregates of one user's category, see category_stats.py."""
+
+    __tablename__ = "category_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    category = Column(String, primary_key=True)
+    data = Column(Text, nullable=False)  # JSON summary
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+
+class SchedulerState(Base):
+    """Where the refresh scheduler left off, so a restart continues the rotation."""
+
+    __tablename__ = "scheduler_state"
+
+    name = Column(String, primary_key=True)
+    cursor_user_id = Column(Integer, nullable=True)  # last (user, category) slot served
+    cursor_category = Column(String, nullable=True)
+    ticks = Column(Integer, default=0)
+    jobs_started = Column(Integer, default=0)
+    students_refreshed = Column(Integer, default=0)
+    last_tick_at = Column(DateTime, nullable=True)
+
+
+class Lease(Base):
+    """A named lock held by one process until expires_at, see leases.py."""
+
+    __tablename__ = "leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class ScoreSnapshot(Base):
+    """A student's scores as of one fetch. Rows are only ever inserted or pruned."""
+
+    __tablename__ = "score_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="CASCADE"), nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    leetcode_solved = Column(Integer, nullable=True)
+    hr_java_stars = Column(SmallInteger, nullable=True)
+    hr_python_stars = Column(SmallInteger, nullable=True)
+    hr_c_stars = Column(SmallInteger, nullable=True)
+    hr_sql_stars = Column(SmallInteger, nullable=True)
+
+    __table_args__ = (
+        Index("ix_score_snapshots_student_taken", "student_id", "taken_at"),
+    )
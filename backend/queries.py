@@ -0,0 +1,92 @@
+import base64
+import json
+
+from sqlalchemy import and_, func, or_
+
+from models import Student
+
+
+# Sort keys accepted by the student list endpoint. Score columns sort NULL
+# (never fetched) as -1 so they stay comparable in keyset conditions.
+SORT_KEYS = {
+    "name": Student.name,
+    "roll_number": Student.roll_number,
+    "leetcode_solved": func.coalesce(Student.leetcode_solved, -1),
+    "hr_java_stars": func.coalesce(Student.hr_java_stars, -1),
+    "hr_python_stars": func.coalesce(Student.hr_python_stars, -1),
+    "hr_c_stars": func.coalesce(Student.hr_c_stars, -1),
+    "hr_sql_stars": func.coalesce(Student.hr_sql_stars, -1),
+}
+
+
+def student_filters(
+    user_id: int,
+    category: str,
+    min_lc: int = None,
+    min_java: int = None,
+    min_python: int = None,
+    min_c: int = None,
+    min_sql: int = None,
+) -> list:
+    """WHERE criteria for a user's students in a category with optional score thresholds."""
+    criteria = [Student.category == category, Student.uploaded_by == user_id]
+    if min_lc is not None:
+        criteria.append(Student.leetcode_solved >= min_lc)
+    if min_java is not None:
+        criteria.append(Student.hr_java_stars >= min_java)
+    if min_python is not None:
+        criteria.append(Student.hr_python_stars >= min_python)
+    if min_c is not None:
+        criteria.append(Student.hr_c_stars >= min_c)
+    if min_sql is not None:
+        criteria.append(Student.hr_sql_stars >= min_sql)
+    return criteria
+
+
+def search_filter(search: str):
+    """Case-insensitive substring match on name or roll number."""
+    escaped = search.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    return or_(
+        Student.name.ilike(pattern, escape="\\"),
+        Student.roll_number.ilike(pattern, escape="\\"),
+    )
+
+
+def encode_cursor(sort: str, order: str, value, student_id: int) -> str:
+    payload = json.dumps({"s": sort, "o": order, "v": value, "id": student_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor: str, sort: str, order: str):
+    """Return (value, id) from a cursor, or raise ValueError if it is invalid for this sort."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        value, student_id = payload["v"], int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Malformed cursor")
+    if payload.get("s") != sort or payload.get("o") != order:
+        raise ValueError("Cursor was issued for a different sort order")
+    return value, student_id
+
+
+def keyset_after(sort: str, order: str, value, student_id: int):
+    """Criterion selecting rows that come after (value, id) in the given order."""
+    key = SORT_KEYS[sort]
+    if order == "desc":
+        return or_(key < value, and_(key == value, Student.id < student_id))
+    return or_(key > value, and_(key == value, Student.id > student_id))
+
+
+def order_by(sort: str, order: str) -> tuple:
+    key = SORT_KEYS[sort]
+    if order == "desc":
+        return key.desc(), Student.id.desc()
+    return key.asc(), Student.id.asc()
+
+
+def sort_value(student: Student, sort: str):
+    value = getattr(student, sort)
+    if value is None and sort not in ("name", "roll_number"):
+        return -1
+    return value
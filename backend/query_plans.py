@@ -0,0 +1,99 @@
+"""Check that the student queries are served by indexes.
+
+Runs EXPLAIN (SQLite or PostgreSQL, whichever DATABASE_URL points at) on the
+queries behind get_students, fetch_student_data, export_category_data and
+delete_category_data, and exits non-zero if any of them scans the students
+table sequentially.
+
+    python query_plans.py            # check the configured database
+    python query_plans.py --create   # apply pending migrations first
+"""
+import argparse
+import re
+import sys
+
+from sqlalchemy import and_, delete, func, select, text
+
+from database import SessionLocal, engine
+from export import EXPORT_COLUMNS
+from migrations import upgrade
+from models import Student
+from queries import keyset_after, order_by, search_filter, student_filters
+from refresh import refresh_query
+
+
+def plan_queries(db) -> dict:
+    """The statements each endpoint sends, with representative parameters."""
+    owner, category = 1, "2nd_year"
+    filtered = student_filters(owner, category, min_lc=100, min_java=3)
+    return {
+        "get_students (roll order)": select(Student)
+        .where(*student_filters(owner, category))
+        .order_by(*order_by("roll_number", "asc")),
+        "get_students (page after cursor)": select(Student)
+        .where(*student_filters(owner, category), keyset_after("roll_number", "asc", "21BCE0100", 100))
+        .order_by(*order_by("roll_number", "asc"))
+        .limit(51),
+        "get_students (sorted by score)": select(Student)
+        .where(*filtered)
+        .order_by(*order_by("leetcode_solved", "desc"))
+        .limit(51),
+        "get_students (search)": select(Student)
+        .where(*student_filters(owner, category), search_filter("21BCE"))
+        .order_by(*order_by("roll_number", "asc")),
+        "get_students (counts)": select(func.count(Student.id), func.count(Student.id).filter(and_(*filtered)))
+        .where(*student_filters(owner, category)),
+        "fetch_student_data (all)": refresh_query(db, owner, category).statement,
+        "fetch_student_data (max_age)": refresh_query(db, owner, category, max_age=86400).statement,
+        "export_category_data": select(*EXPORT_COLUMNS).where(*filtered).order_by(Student.roll_number),
+        "delete_category_data": delete(Student).where(*student_filters(owner, category)),
+    }
+
+
+def explain(conn, statement) -> list:
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+
+def is_sequential_scan(plan: list) -> bool:
+    if engine.dialect.name == "sqlite":
+        # "SEARCH students USING INDEX ..." is fine; "SCAN students" reads every
+        # row, and SQLite before 3.36 words it "SCAN TABLE students"
+        return any(re.match(r"SCAN (TABLE )?students\b", line) for line in plan)
+    return any("Seq Scan on students" in line for line in plan)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--create", action="store_true", help="apply pending migrations first")
+    args = parser.parse_args()
+
+    if args.create:
+        upgrade()
+
+    db = SessionLocal()
+    failures = 0
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                # Small tables make the planner prefer seq scans; we only care
+                # whether an index is usable at all
+                conn.execute(text("SET enable_seqscan = off"))
+            for name, statement in plan_queries(db).items():
+                plan = explain(conn, statement)
+                bad = is_sequential_scan(plan)
+                failures += bad
+                print(f"[{'FAIL' if bad else ' OK '}] {name}")
+                for line in plan:
+                    print(f"        {line}")
+    finally:
+        db.close()
+
+    print(f"\n{failures} quer{'y' if failures == 1 else 'ies'} fell back to a sequential scan")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
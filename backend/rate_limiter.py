@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+# Requests per second allowed for each upstream host
+INITIAL_RATE = float(os.getenv("SCRAPER_RATE_INITIAL", "5"))
+MIN_RATE = float(os.getenv("SCRAPER_RATE_MIN", "0.2"))
+MAX_RATE = float(os.getenv("SCRAPER_RATE_MAX", "20"))
+# Added to the rate after every successful response (additive increase)
+RATE_INCREASE = float(os.getenv("SCRAPER_RATE_INCREASE", "0.5"))
+# Multiplied into the rate after a 429 or 5xx response (multiplicative decrease)
+RATE_DECREASE = float(os.getenv("SCRAPER_RATE_DECREASE", "0.5"))
+# Upper bound on how long a single Retry-After header can pause a host
+MAX_RETRY_AFTER = float(os.getenv("SCRAPER_MAX_RETRY_AFTER", "60"))
+
+
+def parse_retry_after(value) -> float:
+    """Return the delay in seconds described by a Retry-After header, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class _HostState:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.server_errors = 0
+        self.connection_errors = 0
+        self.backoffs = 0
+        self.waited_seconds = 0.0
+
+
+class AdaptiveRateLimiter:
+    """Per-host token buckets whose rate adapts to upstream responses.
+
+    Each success nudges a host's rate up by RATE_INCREASE; a 429, 5xx or
+    connection error multiplies it by RATE_DECREASE and, when the response
+    carries Retry-After, pauses the host until then. The limiter is thread-safe
+    so the sync scraper and the concurrent worker threads share one budget.
+    """
+
+    def __init__(
+        self,
+        initial_rate: float = INITIAL_RATE,
+        min_rate: float = MIN_RATE,
+        max_rate: float = MAX_RATE,
+        increase: float = RATE_INCREASE,
+        decrease: float = RATE_DECREASE,
+    ):
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _state(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.initial_rate)
+        return state
+
+    def acquire(self, host: str):
+        """Block until a request to host is allowed."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                state = self._state(host)
+                now = time.monotonic()
+                # Bursts are capped at one second's worth of requests
+                capacity = max(1.0, state.rate)
+                state.tokens = min(capacity, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+
+                if now < state.blocked_until:
+                    delay = state.blocked_until - now
+                elif state.tokens >= 1:
+                    state.tokens -= 1
+                    state.requests += 1
+                    state.waited_seconds += waited
+                    return
+                else:
+                    delay = (1 - state.tokens) / state.rate
+            time.sleep(delay)
+            waited += delay
+
+    def record(self, host: str, status_code: int = None, retry_after=None):
+        """Adjust a host's rate from the outcome of a request.
+
+        status_code is None when the request failed without a response.
+        """
+        with self._lock:
+            state = self._state(host)
+            if status_code is not None and status_code != 429 and status_code < 500:
+                state.rate = min(self.max_rate, state.rate + self.increase)
+                return
+
+            if status_code == 429:
+                state.throttled += 1
+            elif status_code is None:
+                state.connection_errors += 1
+            else:
+                state.server_errors += 1
+            state.backoffs += 1
+            state.rate = max(self.min_rate, state.rate * self.decrease)
+            state.tokens = min(state.tokens, 0.0)
+
+            delay = parse_retry_after(retry_after)
+            if delay is not None:
+                delay = min(delay, MAX_RETRY_AFTER)
+                state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                host: {
+                    "rate_per_second": round(state.rate, 3),
+                    "requests": state.requests,
+                    "throttled": state.throttled,
+                    "server_errors": state.server_errors,
+                    "connection_errors": state.connection_errors,
+                    "backoffs": state.backoffs,
+                    "waited_seconds": round(state.waited_seconds, 3),
+                    "blocked_for_seconds": round(max(0.0, state.blocked_until - now), 3),
+                }
+                for host, state in self._hosts.items()
+            }
+
+
+limiter = AdaptiveRateLimiter()
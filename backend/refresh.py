@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import or_
+
+from models import Student
+
+
+SCRAPED_FIELDS = ("leetcode_solved", "hr_java_stars", "hr_python_stars", "hr_c_stars", "hr_sql_stars")
+
+
+def student_to_dict(student: Student) -> dict:
+    return {
+        "id": student.id,
+        "name": student.name,
+        "roll_number": student.roll_number,
+        "leetcode_url": student.leetcode_url,
+        "hackerrank_url": student.hackerrank_url,
+        "leetcode_solved": student.leetcode_solved,
+        "hr_java_stars": student.hr_java_stars,
+        "hr_python_stars": student.hr_python_stars,
+        "hr_c_stars": student.hr_c_stars,
+        "hr_sql_stars": student.hr_sql_stars,
+        "last_fetched": student.last_fetched.isoformat() if student.last_fetched else None,
+    }
+
+
+def refresh_query(db, user_id: int, category: str, max_age: int = None):
+    """Query for the students of a category that need scraping, oldest first.
+
+    With max_age (seconds), only students never fetched or last fetched longer
+    ago than that are selected. Never-fetched students come first.
+    """
+    query = db.query(Student).filter(Student.category == category, Student.uploaded_by == user_id)
+    if max_age is not None:
+        # last_fetched is stored as naive UTC
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=max_age)
+        query = query.filter(or_(Student.last_fetched.is_(None), Student.last_fetched < cutoff))
+    return query.order_by(
+        Student.last_fetched.isnot(None), Student.last_fetched, Student.roll_number
+    )
+
+
+def select_students_for_refresh(db, user_id: int, category: str, max_age: int = None) -> list:
+    return refresh_query(db, user_id, category, max_age).all()
+
+
+def apply_scrape_result(student: Student, scraped: dict, fetched_at: datetime = None) -> dict:
+    """Copy a scrape_student_data result onto a Student row.
+
+    last_fetched becomes the time the result was scraped, which is earlier
+    than now when it came from the scrape cache; a result no newer than the
+    row leaves it unchanged. Returns the scores and last_fetched the row had
+    before.
+    """
+    before = {field: getattr(student, field) for field in SCRAPED_FIELDS + ("last_fetched",)}
+    # last_fetched is stored as naive UTC
+    fetched_at = fetched_at or scraped.get("fetched_at") or datetime.now(timezone.utc).replace(tzinfo=None)
+    if student.last_fetched is not None and fetched_at <= student.last_fetched:
+        return before
+    for field in SCRAPED_FIELDS:
+        setattr(student, field, scraped[field])
+    student.last_fetched = fetched_at
+    return before
+
+
+def scrape_failures(scraped: dict) -> list:
+    """Return the platforms whose lookup failed (None) in a scrape result."""
+    failures = []
+    if scraped["leetcode_solved"] is None:
+        failures.append("leetcode")
+    if scraped["hr_java_stars"] is None:
+        failures.append("hackerrank")
+    return failures
@@ -0,0 +1,281 @@
+"""Background refresh scheduler that keeps every student within a freshness target.
+
+Every SCHEDULER_INTERVAL seconds the scheduler counts the students that are
+due (last fetched more than half of SCHEDULER_FRESHNESS_HOURS ago, or never)
+and refreshes a share of them. The share is sized so the backlog drains by
+the time the oldest of them reach the target. Students are handed out one
+at a time, round-robin over the (user, category) slots that have due
+students. The rotation starts after the slot served last, so no user or
+category is starved when the budget is small. Each slot's share runs as a
+scheduled scrape job capped at its part of SCHEDULER_REQUESTS_PER_HOUR, so
+progress, snapshots and stats are recorded as for a user's fetch.
+
+Run it in the API or worker processes with SCHEDULER_ENABLED=1, or on its
+own next to the API. However many processes run it, only the holder of the
+scheduler lease schedules a round:
+
+    python scheduler.py            # run until interrupted
+    python scheduler.py once       # run a single tick
+    python scheduler.py status     # show the persisted state
+"""
+import math
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, or_, select
+
+import jobs
+import leases
+import migrations
+from database import SessionLocal
+from models import SchedulerState, ScrapeJob, ScrapeJobItem, Student
+from scraper import LEETCODE_BATCH_SIZE
+
+
+# Start the scheduler thread with the API process
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "0") == "1"
+# Every student should have been fetched within this many hours
+SCHEDULER_FRESHNESS_HOURS = float(os.getenv("SCHEDULER_FRESHNESS_HOURS", "24"))
+# Seconds between scheduling rounds; each round's jobs get this as their time budget
+SCHEDULER_INTERVAL = int(os.getenv("SCHEDULER_INTERVAL", "300"))
+# Upstream requests the scheduler may spend per hour across all users
+SCHEDULER_REQUESTS_PER_HOUR = int(os.getenv("SCHEDULER_REQUESTS_PER_HOUR", "1200"))
+# Finished scheduled jobs are deleted after this many days
+SCHEDULER_JOB_RETENTION_DAYS = int(os.getenv("SCHEDULER_JOB_RETENTION_DAYS", "7"))
+
+STATE_NAME = "refresh"
+LEASE_NAME = "scheduler"
+# The scheduler lease outlives a few idle intervals, so its holder keeps the role between rounds
+LEASE_SECONDS = max(SCHEDULER_INTERVAL * 3, leases.LEASE_SECONDS)
+
+
+def refresh_age() -> int:
+    """Age in seconds at which a student becomes due."""
+    return int(SCHEDULER_FRESHNESS_HOURS * 3600 / 2)
+
+
+def due_slots(db, max_age: int) -> list:
+    """Return [((user_id, category), due student count)] ordered by user and category."""
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=max_age)
+    rows = (
+        db.query(Student.uploaded_by, Student.category, func.count(Student.id))
+        .filter(or_(Student.last_fetched.is_(None), Student.last_fetched < cutoff))
+        .group_by(Student.uploaded_by, Student.category)
+        .order_by(Student.uploaded_by, Student.category)
+        .all()
+    )
+    return [((user_id, category), count) for user_id, category, count in rows]
+
+
+def allocate(slots: list, cursor: tuple, quota: int) -> list:
+    """Deal quota students round-robin over slots, starting after cursor.
+
+    Returns [(slot, students)] in dealing order, leaving out slots that got none.
+    """
+    if not slots or quota <= 0:
+        return []
+    start = next((i + 1 for i, (slot, _) in enumerate(slots) if slot == cursor), 0)
+    order = slots[start:] + slots[:start]
+    shares = [0] * len(order)
+    remaining = quota
+    while remaining:
+        dealt = False
+        for i, (_, due) in enumerate(order):
+            if remaining and shares[i] < due:
+                shares[i] += 1
+                remaining -= 1
+                dealt = True
+        if not dealt:
+            break
+    return [(slot, share) for (slot, _), share in zip(order, shares) if share]
+
+
+def load_state(db) -> SchedulerState:
+    state = db.query(SchedulerState).filter(SchedulerState.name == STATE_NAME).first()
+    if state is None:
+        state = SchedulerState(name=STATE_NAME, ticks=0, jobs_started=0, students_refreshed=0)
+        db.add(state)
+        db.flush()
+    return state
+
+
+def prune_jobs(db):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=SCHEDULER_JOB_RETENTION_DAYS)
+    old_jobs = select(ScrapeJob.id).where(
+        ScrapeJob.scheduled.is_(True),
+        ScrapeJob.status.notin_(jobs.ACTIVE_STATUSES),
+        ScrapeJob.finished_at < cutoff,
+    )
+    db.query(ScrapeJobItem).filter(ScrapeJobItem.job_id.in_(old_jobs)).delete(synchronize_session=False)
+    db.query(ScrapeJob).filter(ScrapeJob.id.in_(old_jobs)).delete(synchronize_session=False)
+
+
+def tick(holder: str) -> dict:
+    """Run one scheduling round as holder of the scheduler lease and return what it did.
+
+    The lease is renewed for as long as the round runs; if it is lost, the
+    round's remaining jobs are left queued for other processes to claim.
+    """
+    if not leases.acquire(LEASE_NAME, holder, LEASE_SECONDS):
+        return {"skipped": "another process holds the scheduler lease"}
+    heartbeat = leases.Heartbeat(lambda: leases.renew(LEASE_NAME, holder, LEASE_SECONDS)).start()
+    try:
+        return _schedule_round(heartbeat)
+    finally:
+        heartbeat.stop()
+
+
+def _schedule_round(heartbeat: leases.Heartbeat) -> dict:
+    db = SessionLocal()
+    try:
+        max_age = refresh_age()
+        slots = due_slots(db, max_age)
+        due = sum(count for _, count in slots)
+        # Drain the backlog before the oldest due students reach the freshness target
+        window = max(SCHEDULER_FRESHNESS_HOURS * 3600 - max_age, SCHEDULER_INTERVAL)
+        quota = math.ceil(due * SCHEDULER_INTERVAL / window)
+        # Every student costs a HackerRank request plus its share of a LeetCode batch
+        request_budget = SCHEDULER_REQUESTS_PER_HOUR * SCHEDULER_INTERVAL // 3600
+        quota = min(quota, request_budget * LEETCODE_BATCH_SIZE // (LEETCODE_BATCH_SIZE + 1))
+
+        state = load_state(db)
+        allocations = [
+            (slot, share)
+            for slot, share in allocate(slots, (state.cursor_user_id, state.cursor_category), quota)
+            # A user's own fetch is already refreshing this slot
+            if not jobs.find_active_job(db, *slot)
+        ]
+        job_ids = []
+        for (user_id, category), share in allocations:
+            # Created claimed, so job pollers leave it to this round
+            job_holder = leases.new_token()
+            job = jobs.create_job(
+                db,
+                user_id,
+                category,
+                share,
+                max_age=max_age,
+                time_budget=SCHEDULER_INTERVAL,
+                max_requests=share + math.ceil(share / LEETCODE_BATCH_SIZE),
+                scheduled=True,
+                claimed_by=job_holder,
+            )
+            job_ids.append((job.id, job_holder))
+        if allocations:
+            state.cursor_user_id, state.cursor_category = allocations[-1][0]
+        state.ticks += 1
+        state.jobs_started += len(job_ids)
+        state.last_tick_at = datetime.now(timezone.utc)
+        prune_jobs(db)
+        db.commit()
+    finally:
+        db.close()
+
+    # Jobs run one after another so the round stays within its request budget
+    for job_id, job_holder in job_ids:
+        if heartbeat.lost.is_set():
+            jobs.release_claim(job_id, job_holder)
+        else:
+            jobs.run_job(job_id, job_holder)
+
+    db = SessionLocal()
+    try:
+        refreshed = (
+            db.query(func.coalesce(func.sum(ScrapeJob.completed + ScrapeJob.failed), 0))
+            .filter(ScrapeJob.id.in_([job_id for job_id, _ in job_ids]))
+            .scalar()
+            if job_ids else 0
+        )
+        state = load_state(db)
+        state.students_refreshed += refreshed
+        db.commit()
+    finally:
+        db.close()
+    return {"due": due, "quota": quota, "jobs": len(job_ids), "refreshed": refreshed}
+
+
+def status(db) -> dict:
+    state = db.query(SchedulerState).filter(SchedulerState.name == STATE_NAME).first()
+    slots = due_slots(db, refresh_age())
+    return {
+        "enabled": SCHEDULER_ENABLED,
+        "freshness_hours": SCHEDULER_FRESHNESS_HOURS,
+        "interval_seconds": SCHEDULER_INTERVAL,
+        "requests_per_hour": SCHEDULER_REQUESTS_PER_HOUR,
+        "due_students": sum(count for _, count in slots),
+        "due_slots": len(slots),
+        "ticks": state.ticks if state else 0,
+        "jobs_started": state.jobs_started if state else 0,
+        "students_refreshed": state.students_refreshed if state else 0,
+        "last_tick_at": state.last_tick_at.isoformat() if state and state.last_tick_at else None,
+        "cursor": {"user_id": state.cursor_user_id, "category": state.cursor_category} if state else None,
+    }
+
+
+_stop = threading.Event()
+_thread = None
+
+
+def run_forever(stop: threading.Event = _stop):
+    """Schedule a round every interval until stop is set, then hand the lease back."""
+    holder = leases.new_token()
+    try:
+        while not stop.is_set():
+            started = datetime.now(timezone.utc)
+            try:
+                tick(holder)
+            except Exception as e:
+                print(f"Error in refresh scheduler tick: {e}")
+            elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+            stop.wait(max(0.0, SCHEDULER_INTERVAL - elapsed))
+    finally:
+        leases.release(LEASE_NAME, holder)
+
+
+def start():
+    """Run the scheduler on a daemon thread of this process."""
+    global _thread
+    if _thread is None:
+        _stop.clear()
+        _thread = threading.Thread(target=run_forever, name="refresh-scheduler", daemon=True)
+        _thread.start()
+
+
+def stop():
+    """Ask the scheduler thread to exit; it releases the lease once its round ends."""
+    global _thread
+    _stop.set()
+    _thread = None
+
+
+def main(argv) -> int:
+    migrations.check_schema()
+    command = argv[1] if len(argv) > 1 else "run"
+    if command == "run":
+        print(f"Refresh scheduler running every {SCHEDULER_INTERVAL}s")
+        try:
+            run_forever()
+        except KeyboardInterrupt:
+            pass
+    elif command == "once":
+        holder = leases.new_token()
+        try:
+            print(tick(holder))
+        finally:
+            leases.release(LEASE_NAME, holder)
+    elif command == "status":
+        db = SessionLocal()
+        try:
+            print(status(db))
+        finally:
+            db.close()
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
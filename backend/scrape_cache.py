@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import SCRAPE_CACHE_LOOKUPS
+
+
+# Seconds a scraped value is served as fresh
+SCRAPE_CACHE_TTL = float(os.getenv("SCRAPE_CACHE_TTL", "3600"))
+# Seconds after the TTL during which a stale value is served while it is refreshed
+SCRAPE_CACHE_STALE_TTL = float(os.getenv("SCRAPE_CACHE_STALE_TTL", "86400"))
+# Seconds a "no such user" answer is remembered; 0 disables negative caching
+SCRAPE_CACHE_NEGATIVE_TTL = float(os.getenv("SCRAPE_CACHE_NEGATIVE_TTL", "21600"))
+# Maximum number of entries kept in memory (least recently used are evicted)
+SCRAPE_CACHE_SIZE = int(os.getenv("SCRAPE_CACHE_SIZE", "10000"))
+# Optional SQLite file so cached values survive restarts; empty keeps it in memory only
+SCRAPE_CACHE_DB = os.getenv("SCRAPE_CACHE_DB", "")
+
+# Expired rows are pruned from the SQLite table once every this many writes
+_PRUNE_EVERY = 500
+
+# Returned by fetch functions when the platform says the user doesn't exist.
+# It is cached for negative_ttl, unlike None, which means the lookup failed.
+NOT_FOUND = object()
+# How a NOT_FOUND entry is stored; real values are never JSON null
+_NOT_FOUND_JSON = "null"
+
+
+class ScrapeCache:
+    """LRU cache of scraped values keyed by platform and username.
+
+    Values younger than ttl are fresh hits. Values between ttl and
+    ttl + stale_ttl are returned immediately while a background thread
+    re-scrapes them (stale-while-revalidate). Anything older is a miss.
+    NOT_FOUND results are negative entries: lookups return (True, None) for
+    negative_ttl, with no stale period. None results are never cached, so
+    failed lookups are retried next time.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SCRAPE_CACHE_TTL,
+        stale_ttl: float = SCRAPE_CACHE_STALE_TTL,
+        negative_ttl: float = SCRAPE_CACHE_NEGATIVE_TTL,
+        max_entries: int = SCRAPE_CACHE_SIZE,
+        db_path: str = SCRAPE_CACHE_DB,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (fetched_at, json value)
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="scrape-cache")
+        self._writes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.evictions = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS scrape_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, fetched_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _load(self, key: str):
+        """Return (fetched_at, json value) for key, reading through to SQLite. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT fetched_at, value FROM scrape_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self._remember(key, row)
+        return row
+
+    def _remember(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def set(self, key: str, value):
+        if value is None or (value is NOT_FOUND and not self.negative_ttl):
+            return
+        entry = (time.time(), _NOT_FOUND_JSON if value is NOT_FOUND else json.dumps(value))
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO scrape_cache (key, value, fetched_at) VALUES (?, ?, ?)",
+                    (key, entry[1], entry[0]),
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._db.execute(
+                        "DELETE FROM scrape_cache WHERE fetched_at < ?",
+                        (time.time() - max(self.ttl + self.stale_ttl, self.negative_ttl),),
+                    )
+                self._db.commit()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM scrape_cache WHERE key = ?", (key,))
+                self._db.commit()
+
+    def lookup(self, key: str, refresh):
+        """Return (found, value, fetched_at) for key without fetching on a miss.
+
+        fetched_at is when the value was scraped (a time.time() timestamp), so
+        callers storing the value can date it correctly. A stale entry counts
+        as found; refresh() is scheduled in the background to replace it. A
+        negative entry is found with a value of None.
+        """
+        with self._lock:
+            entry = self._load(key)
+            age = time.time() - entry[0] if entry else None
+            if entry and entry[1] == _NOT_FOUND_JSON:
+                if age < self.negative_ttl:
+                    self.negative_hits += 1
+                    SCRAPE_CACHE_LOOKUPS.inc(result="negative")
+                    return True, None, entry[0]
+            elif entry and age < self.ttl:
+                self.hits += 1
+                SCRAPE_CACHE_LOOKUPS.inc(result="hit")
+                return True, json.loads(entry[1]), entry[0]
+            elif entry and age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                SCRAPE_CACHE_LOOKUPS.inc(result="stale")
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self._refresher.submit(self._refresh, key, refresh)
+                return True, json.loads(entry[1]), entry[0]
+            self.misses += 1
+            SCRAPE_CACHE_LOOKUPS.inc(result="miss")
+            return False, None, None
+
+    def get_or_fetch(self, key: str, fetch):
+        """Return (value, fetched_at) for key, calling fetch() on a miss.
+
+        A NOT_FOUND result is cached and returned as None.
+        """
+        found, value, fetched_at = self.lookup(key, fetch)
+        if found:
+            return value, fetched_at
+        fetched_at = time.time()
+        value = fetch()
+        self.set(key, value)
+        return (None if value is NOT_FOUND else value), fetched_at
+
+    def _refresh(self, key: str, fetch):
+        try:
+            self.set(key, fetch())
+            with self._lock:
+                self.refreshes += 1
+        except Exception as e:
+            print(f"Error refreshing cached value for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.negative_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "negative_entries": sum(1 for _, value in self._entries.values() if value == _NOT_FOUND_JSON),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.stale_hits + self.negative_hits) / lookups, 3) if lookups else None,
+                "background_refreshes": self.refreshes,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+            }
+
+
+scrape_cache = ScrapeCache()
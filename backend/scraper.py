@@ -2,8 +2,18 @@ import requests
 import re
 import time
 import json
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
+from circuit_breaker import CircuitOpenError, breaker
+from http_pool import pools
+from metrics import SCRAPER_LOOKUPS, UPSTREAM_SECONDS
+from rate_limiter import limiter
+from scrape_cache import NOT_FOUND, scrape_cache
+
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -11,13 +21,93 @@ HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
 }
 
+# Upstream endpoints can be pointed at a local stub server for testing
+LEETCODE_GRAPHQL_URL = os.getenv("LEETCODE_GRAPHQL_URL", "https://leetcode.com/graphql")
+HACKERRANK_BASE_URL = os.getenv("HACKERRANK_BASE_URL", "https://www.hackerrank.com").rstrip("/")
+
+# Maximum number of in-flight requests per upstream host during bulk scrapes
+LEETCODE_CONCURRENCY = int(os.getenv("LEETCODE_CONCURRENCY", "4"))
+HACKERRANK_CONCURRENCY = int(os.getenv("HACKERRANK_CONCURRENCY", "8"))
+
+# Usernames resolved per LeetCode GraphQL request in batch lookups
+LEETCODE_BATCH_SIZE = int(os.getenv("LEETCODE_BATCH_SIZE", "20"))
+
+# Attempts per upstream call when the host answers 429 or 5xx
+MAX_ATTEMPTS = int(os.getenv("SCRAPER_MAX_ATTEMPTS", "3"))
+
+
+def _request(method: str, url: str, platform: str, **kwargs) -> requests.Response:
+    """Send a request over the pooled client for its host, rate limited per host.
+
+    Throttled (429) and 5xx responses are retried after the limiter has backed
+    off, up to MAX_ATTEMPTS times; the last response is returned either way.
+    Every attempt is timed under the given platform name. Calls that end in a
+    connection error, timeout or 5xx count against the platform's circuit
+    breaker, and CircuitOpenError is raised without a request while it is open.
+    """
+    host = urlparse(url).netloc
+    breaker.before_call(platform)
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        limiter.acquire(host)
+        started = time.perf_counter()
+        try:
+            response = pools.request(method, url, **kwargs)
+        except pools.errors:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, platform=platform, status="error")
+            limiter.record(host, None)
+            breaker.record_failure(platform)
+            raise
+        except Exception:
+            breaker.record_failure(platform)
+            raise
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, platform=platform, status=str(response.status_code))
+        limiter.record(host, response.status_code, response.headers.get("Retry-After"))
+        if response.status_code != 429 and response.status_code < 500:
+            break
+    if response.status_code >= 500:
+        breaker.record_failure(platform)
+    else:
+        breaker.record_success(platform)
+    return response
+
+
+def _counted(platform: str, value):
+    """Count a lookup as ok, not_found, or none when nothing could be read, and return it."""
+    if value is NOT_FOUND:
+        outcome = "not_found"
+    else:
+        outcome = "none" if value is None else "ok"
+    SCRAPER_LOOKUPS.inc(platform=platform, outcome=outcome)
+    return value
+
+
+def _parse_profile_url(url: str):
+    url = url.strip().rstrip("/")
+    # "leetcode.com/u/name" has no scheme, so urlparse would read the host as a path
+    if "://" not in url and "." in url.split("/")[0]:
+        url = f"https://{url}"
+    return urlparse(url)
+
+
+def normalize_handle(username: str, lowercase: bool = True) -> str:
+    """Canonical form of a platform username.
+
+    It is both what is sent upstream and the cache and dedup key, so a
+    result is only ever shared between spellings that request the same
+    thing. HackerRank usernames are case-insensitive and lowercased;
+    LeetCode ones keep their case (lowercase=False).
+    """
+    if not username:
+        return None
+    username = username.strip().lstrip("@")
+    return (username.lower() if lowercase else username) or None
+
 
 def extract_leetcode_username(url: str) -> str:
     """Extract username from LeetCode URL."""
     if not url:
         return None
-    url = url.strip().rstrip("/")
-    parsed = urlparse(url)
+    parsed = _parse_profile_url(url)
     path_parts = [p for p in parsed.path.split("/") if p]
 
     if not path_parts:
@@ -40,8 +130,7 @@ def extract_hackerrank_username(url: str) -> str:
     """Extract username from HackerRank URL."""
     if not url:
         return None
-    url = url.strip().rstrip("/")
-    parsed = urlparse(url)
+    parsed = _parse_profile_url(url)
     path_parts = [p for p in parsed.path.split("/") if p]
 
     if not path_parts:
@@ -59,14 +148,31 @@ def extract_hackerrank_username(url: str) -> str:
     return None
 
 
-def fetch_leetcode_solved(url: str) -> int:
-    """Fetch the total number of problems solved on LeetCode."""
-    username = extract_leetcode_username(url)
+def leetcode_handle(url: str) -> str:
+    """The LeetCode username to request and cache for a profile URL."""
+    return normalize_handle(extract_leetcode_username(url), lowercase=False)
+
+
+def hackerrank_handle(url: str) -> str:
+    """The HackerRank username to request and cache for a profile URL."""
+    return normalize_handle(extract_hackerrank_username(url))
+
+
+def fetch_leetcode_solved(url: str) -> tuple:
+    """Fetch the total number of problems solved on LeetCode.
+
+    Returns (count, fetched_at); fetched_at is older than now for cached counts.
+    """
+    username = leetcode_handle(url)
     if not username:
-        return 0
+        return 0, time.time()
 
+    return scrape_cache.get_or_fetch(f"leetcode:{username}", lambda: _fetch_leetcode_solved(username))
+
+
+def _fetch_leetcode_solved(username: str) -> int:
     try:
-        graphql_url = "https://leetcode.com/graphql"
+        graphql_url = LEETCODE_GRAPHQL_URL
         query = """
         query userProblemsSolved($username: String!) {
             matchedUser(username: $username) {
@@ -80,8 +186,10 @@ def fetch_leetcode_solved(url: str) -> int:
         }
         """
 
-        response = requests.post(
+        response = _request(
+            "POST",
             graphql_url,
+            "leetcode",
             json={"query": query, "variables": {"username": username}},
             headers={
                 **HEADERS,
@@ -95,30 +203,140 @@ def fetch_leetcode_solved(url: str) -> int:
         if response.status_code == 200:
             data = response.json()
             if data.get("data") and data["data"].get("matchedUser"):
-                ac_stats = data["data"]["matchedUser"]["submitStatsGlobal"]["acSubmissionNum"]
-                for stat in ac_stats:
-                    if stat["difficulty"] == "All":
-                        return stat["count"]
-            return None # User not found in GraphQL
-        return None # 404 or other error
+                return _counted("leetcode", _solved_count(data["data"]["matchedUser"]))
+            if data.get("data"):
+                return _counted("leetcode", NOT_FOUND) # User not found in GraphQL
+        return _counted("leetcode", None) # Bad response or other error
+    except CircuitOpenError:
+        SCRAPER_LOOKUPS.inc(platform="leetcode", outcome="rejected")
+        return None
     except Exception as e:
+        SCRAPER_LOOKUPS.inc(platform="leetcode", outcome="error")
         print(f"Error fetching LeetCode data for {username}: {e}")
         return None
 
 
-def fetch_hackerrank_badges(url: str) -> dict:
-    """Fetch HackerRank skill badges/stars for Java, Python, C, SQL."""
-    username = extract_hackerrank_username(url)
-    result = {"java": 0, "python": 0, "c": 0, "sql": 0}
+def _solved_count(matched_user: dict) -> int:
+    ac_stats = matched_user["submitStatsGlobal"]["acSubmissionNum"]
+    for stat in ac_stats:
+        if stat["difficulty"] == "All":
+            return stat["count"]
+    return None
+
+
+def fetch_leetcode_solved_batch(usernames: list, batch_size: int = LEETCODE_BATCH_SIZE) -> dict:
+    """Fetch solved counts for many LeetCode usernames, given as leetcode_handle() returns them.
+
+    Cached usernames are answered from the cache; the rest are looked up in
+    GraphQL documents of up to batch_size aliased matchedUser selections.
+    Returns {username: (count, fetched_at)}, with a count of None for users
+    that were not found or could not be fetched; users that were not found
+    are cached as such.
+    """
+    results = {}
+    missing = []
+    for username in dict.fromkeys(usernames):
+        found, value, fetched_at = scrape_cache.lookup(
+            f"leetcode:{username}", lambda username=username: _fetch_leetcode_solved(username)
+        )
+        if found:
+            results[username] = value, fetched_at
+        else:
+            missing.append(username)
+
+    for start in range(0, len(missing), batch_size):
+        chunk = missing[start:start + batch_size]
+        fetched_at = time.time()
+        counts = _fetch_leetcode_batch(chunk)
+        if counts is None:
+            # The whole batch failed, so fall back to one query per user
+            counts = {username: _fetch_leetcode_solved(username) for username in chunk}
+        for username, count in counts.items():
+            scrape_cache.set(f"leetcode:{username}", count)
+            results[username] = (None if count is NOT_FOUND else count), fetched_at
+
+    return results
+
+
+def _fetch_leetcode_batch(usernames: list) -> dict:
+    """Resolve usernames with one aliased GraphQL query.
+
+    Returns {username: count, NOT_FOUND or None}, or None if the request
+    itself failed.
+    """
+    aliases = {f"u{i}": username for i, username in enumerate(usernames)}
+    selections = "\n".join(
+        f"""
+            {alias}: matchedUser(username: ${alias}) {{
+                submitStatsGlobal {{
+                    acSubmissionNum {{
+                        difficulty
+                        count
+                    }}
+                }}
+            }}"""
+        for alias in aliases
+    )
+    params = ", ".join(f"${alias}: String!" for alias in aliases)
+    query = f"query batchProblemsSolved({params}) {{{selections}\n        }}"
+
+    try:
+        response = _request(
+            "POST",
+            LEETCODE_GRAPHQL_URL,
+            "leetcode",
+            json={"query": query, "variables": aliases},
+            headers={
+                **HEADERS,
+                "Content-Type": "application/json",
+                "Referer": "https://leetcode.com/",
+                "Origin": "https://leetcode.com",
+            },
+            timeout=15,
+        )
+        if response.status_code != 200:
+            return None
+        data = response.json().get("data")
+        if not data:
+            return None
+
+        # Users that don't exist come back as null aliases alongside an "errors" entry
+        return {
+            username: _counted("leetcode", _solved_count(data[alias]) if data.get(alias) else NOT_FOUND)
+            for alias, username in aliases.items()
+        }
+    except CircuitOpenError:
+        # Falling back to per-user queries would only be rejected too
+        SCRAPER_LOOKUPS.inc(amount=len(usernames), platform="leetcode", outcome="rejected")
+        return {username: None for username in usernames}
+    except Exception as e:
+        print(f"Error fetching LeetCode batch of {len(usernames)} users: {e}")
+        return None
+
+
+def fetch_hackerrank_badges(url: str) -> tuple:
+    """Fetch HackerRank skill badges/stars for Java, Python, C, SQL.
+
+    Returns (badges, fetched_at); fetched_at is older than now for cached badges.
+    """
+    username = hackerrank_handle(url)
 
     if not username:
-        return result
+        return {"java": 0, "python": 0, "c": 0, "sql": 0}, time.time()
+
+    return scrape_cache.get_or_fetch(f"hackerrank:{username}", lambda: _fetch_hackerrank_badges(username))
+
+
+def _fetch_hackerrank_badges(username: str) -> dict:
+    result = {"java": 0, "python": 0, "c": 0, "sql": 0}
 
     try:
         # Try the badges API endpoint
-        badges_url = f"https://www.hackerrank.com/rest/hackers/{username}/badges"
-        response = requests.get(
+        badges_url = f"{HACKERRANK_BASE_URL}/rest/hackers/{username}/badges"
+        response = _request(
+            "GET",
             badges_url,
+            "hackerrank",
             headers=HEADERS,
             timeout=15,
         )
@@ -139,18 +357,26 @@ def fetch_hackerrank_badges(url: str) -> dict:
                 elif "sql" in badge_name:
                     result["sql"] = max(result["sql"], stars)
 
-            return result
-        return None
+            return _counted("hackerrank", result)
+        if response.status_code == 404:
+            return _counted("hackerrank", NOT_FOUND)
+        return _counted("hackerrank", None)
 
+    except CircuitOpenError:
+        SCRAPER_LOOKUPS.inc(platform="hackerrank", outcome="rejected")
+        return None
     except Exception as e:
+        SCRAPER_LOOKUPS.inc(platform="hackerrank", outcome="error")
         print(f"Error fetching HackerRank badges for {username}: {e}")
         return None
 
     # Fallback: try the profile API
     try:
-        profile_url = f"https://www.hackerrank.com/rest/hackers/{username}"
-        response = requests.get(
+        profile_url = f"{HACKERRANK_BASE_URL}/rest/hackers/{username}"
+        response = _request(
+            "GET",
             profile_url,
+            "hackerrank",
             headers=HEADERS,
             timeout=15,
         )
@@ -179,17 +405,143 @@ def fetch_hackerrank_badges(url: str) -> dict:
     return result
 
 
-def scrape_student_data(leetcode_url: str, hackerrank_url: str) -> dict:
-    """Scrape both LeetCode and HackerRank data for a student."""
-    leetcode_solved = fetch_leetcode_solved(leetcode_url)
-    time.sleep(0.3)  # Small delay to avoid rate limiting
-    hr_badges = fetch_hackerrank_badges(hackerrank_url)
-    time.sleep(0.3)
+def _build_result(leetcode: tuple, hackerrank: tuple) -> dict:
+    """Combine (value, fetched_at) lookups into a result dated by its older half.
 
+    fetched_at is naive UTC, like the DateTime columns it is stored in.
+    """
+    (leetcode_solved, leetcode_at), (hr_badges, hackerrank_at) = leetcode, hackerrank
     return {
         "leetcode_solved": leetcode_solved,
         "hr_java_stars": hr_badges["java"] if hr_badges else None,
         "hr_python_stars": hr_badges["python"] if hr_badges else None,
         "hr_c_stars": hr_badges["c"] if hr_badges else None,
         "hr_sql_stars": hr_badges["sql"] if hr_badges else None,
+        "fetched_at": datetime.fromtimestamp(min(leetcode_at, hackerrank_at), timezone.utc).replace(tzinfo=None),
     }
+
+
+def scrape_student_data(leetcode_url: str, hackerrank_url: str) -> dict:
+    """Scrape both LeetCode and HackerRank data for a student."""
+    return _build_result(fetch_leetcode_solved(leetcode_url), fetch_hackerrank_badges(hackerrank_url))
+
+
+def duplicate_lookups(students: list) -> int:
+    """Count the upstream lookups a bulk scrape saves by sharing duplicate handles."""
+    saved = 0
+    for handle_of, position in ((leetcode_handle, 0), (hackerrank_handle, 1)):
+        handles = [handle_of(pair[position]) for pair in students]
+        handles = [h for h in handles if h]
+        saved += len(handles) - len(set(handles))
+    return saved
+
+
+class ScrapeBudget:
+    """Caps a bulk scrape by wall-clock time and/or upstream requests.
+
+    Students that haven't started when the budget runs out are skipped; ones
+    already in flight are allowed to finish.
+    """
+
+    def __init__(self, seconds: float = None, max_requests: int = None):
+        self.deadline = time.monotonic() + seconds if seconds is not None else None
+        self.max_requests = max_requests
+        self.requests = 0
+        self.stopped = False
+
+    def stop(self):
+        """Exhaust the budget now, e.g. because the caller can't record more results."""
+        self.stopped = True
+
+    def exhausted(self) -> bool:
+        if self.stopped:
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        return self.max_requests is not None and self.requests >= self.max_requests
+
+    def charge(self, requests: int = 1):
+        self.requests += requests
+
+
+async def scrape_students_async(students: list, on_result=None, budget: ScrapeBudget = None) -> list:
+    """Scrape many (leetcode_url, hackerrank_url) pairs concurrently.
+
+    Handles are normalized (see normalize_handle) and each unique one is
+    looked up once per run, with the result fanned out to every student that
+    shares it. LeetCode usernames
+    are resolved in batched GraphQL queries and HackerRank profiles one by
+    one, each bounded by its own per-host semaphore so one slow platform
+    doesn't hold up the other. Students start in input order and
+    results are returned in that order with the same shape as
+    scrape_student_data; students skipped because the budget ran out are None.
+    If given, on_result(index, scraped) is called on the event loop as each
+    student completes.
+    """
+    loop = asyncio.get_running_loop()
+    leetcode_slots = asyncio.Semaphore(LEETCODE_CONCURRENCY)
+    hackerrank_slots = asyncio.Semaphore(HACKERRANK_CONCURRENCY)
+    executor = ThreadPoolExecutor(
+        max_workers=LEETCODE_CONCURRENCY + HACKERRANK_CONCURRENCY,
+        thread_name_prefix="scraper",
+    )
+
+    async def fetch_batch(chunk):
+        async with leetcode_slots:
+            return await loop.run_in_executor(executor, fetch_leetcode_solved_batch, chunk)
+
+    leetcode_usernames = [leetcode_handle(lc) for lc, _ in students]
+    unique_usernames = list(dict.fromkeys(u for u in leetcode_usernames if u))
+    chunks = [
+        unique_usernames[start:start + LEETCODE_BATCH_SIZE]
+        for start in range(0, len(unique_usernames), LEETCODE_BATCH_SIZE)
+    ]
+    chunk_of = {username: i for i, chunk in enumerate(chunks) for username in chunk}
+    batch_tasks = {}
+    hackerrank_tasks = {}
+
+    def leetcode_task(username):
+        # Batches are only sent once a student that needs them has started
+        i = chunk_of[username]
+        if i not in batch_tasks:
+            if budget:
+                budget.charge()
+            batch_tasks[i] = asyncio.ensure_future(fetch_batch(chunks[i]))
+        return batch_tasks[i]
+
+    async def scrape_one(index, username, hackerrank_url):
+        handle = hackerrank_handle(hackerrank_url)
+        async with hackerrank_slots:
+            if budget and budget.exhausted():
+                return None
+            task = leetcode_task(username) if username else None
+            hr_task = hackerrank_tasks.get(handle) if handle else None
+            if handle and hr_task is None:
+                if budget:
+                    budget.charge()
+                hr_task = hackerrank_tasks[handle] = loop.run_in_executor(
+                    executor, fetch_hackerrank_badges, hackerrank_url
+                )
+                # Hold the slot while this handle's request is in flight
+                await asyncio.wait([hr_task])
+        hackerrank = await hr_task if hr_task else fetch_hackerrank_badges(hackerrank_url)
+        leetcode = (await task)[username] if task else (0, time.time())
+        scraped = _build_result(leetcode, hackerrank)
+        if on_result:
+            on_result(index, scraped)
+        return scraped
+
+    try:
+        return await asyncio.gather(
+            *(
+                scrape_one(i, username, hr)
+                for i, (username, (_, hr)) in enumerate(zip(leetcode_usernames, students))
+            )
+        )
+    finally:
+        executor.shutdown(wait=False)
+
+
+def scrape_students_data(students: list, on_result=None, budget: ScrapeBudget = None) -> list:
+    """Blocking wrapper around scrape_students_async for sync callers."""
+    return asyncio.run(scrape_students_async(students, on_result, budget))
@@ -0,0 +1,197 @@
+"""Score history: snapshots written on every fetch and the trend queries over them.
+
+Old snapshots are downsampled to one per student per week and eventually
+dropped; run the pruning by hand with:
+
+    python snapshots.py prune
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, select
+
+from database import SessionLocal, engine
+from models import ScoreSnapshot, Student
+from refresh import SCRAPED_FIELDS
+
+
+# Snapshots buffered by a refresh job before they are inserted
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", "100"))
+# Every snapshot is kept this many days, then only the last one of each week
+SNAPSHOT_RAW_DAYS = int(os.getenv("SNAPSHOT_RAW_DAYS", "30"))
+# Snapshots older than this many days are deleted (0 keeps them forever)
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", "365"))
+
+
+def _utcnow():
+    # DateTime columns are stored as naive UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def snapshot_values(student: Student) -> dict:
+    values = {field: getattr(student, field) for field in SCRAPED_FIELDS}
+    values["student_id"] = student.id
+    values["taken_at"] = student.last_fetched or _utcnow()
+    return values
+
+
+def record_snapshots(db, rows: list) -> int:
+    """Insert snapshot_values rows in one executemany; the caller commits.
+
+    Rows where every lookup failed are left out.
+    """
+    rows = [row for row in rows if any(row[field] is not None for field in SCRAPED_FIELDS)]
+    if rows:
+        db.execute(insert(ScoreSnapshot), rows)
+    return len(rows)
+
+
+def delete_snapshots(db, student_criteria: list):
+    """Delete the snapshots of the students matching the criteria.
+
+    Called before the students themselves are bulk-deleted, since SQLite
+    doesn't enforce the foreign key's ON DELETE CASCADE.
+    """
+    student_ids = select(Student.id).where(*student_criteria)
+    db.execute(
+        delete(ScoreSnapshot)
+        .where(ScoreSnapshot.student_id.in_(student_ids))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def week_start(column):
+    """SQL expression for the Monday (YYYY-MM-DD) of the week a timestamp falls in."""
+    if engine.dialect.name == "postgresql":
+        return func.to_char(func.date_trunc("week", column), "YYYY-MM-DD")
+    return func.date(column, "weekday 0", "-6 days")
+
+
+def prune_snapshots(db, student_criteria: list = None) -> int:
+    """Apply the retention policy and return the number of snapshots deleted.
+
+    Snapshots older than SNAPSHOT_RAW_DAYS are reduced to the latest one per
+    student per week; those older than SNAPSHOT_RETENTION_DAYS are removed.
+    With student_criteria only those students' snapshots are touched. The
+    caller commits.
+    """
+    now = _utcnow()
+    scope = []
+    if student_criteria:
+        scope.append(ScoreSnapshot.student_id.in_(select(Student.id).where(*student_criteria)))
+
+    deleted = 0
+    if SNAPSHOT_RETENTION_DAYS:
+        expired = now - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+        deleted += db.execute(
+            delete(ScoreSnapshot)
+            .where(*scope, ScoreSnapshot.taken_at < expired)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+    raw_cutoff = now - timedelta(days=SNAPSHOT_RAW_DAYS)
+    # Ids only grow, so the highest id of a week is its latest snapshot
+    weekly_latest = (
+        select(func.max(ScoreSnapshot.id))
+        .where(*scope, ScoreSnapshot.taken_at < raw_cutoff)
+        .group_by(ScoreSnapshot.student_id, week_start(ScoreSnapshot.taken_at))
+    )
+    deleted += db.execute(
+        delete(ScoreSnapshot)
+        .where(*scope, ScoreSnapshot.taken_at < raw_cutoff, ScoreSnapshot.id.not_in(weekly_latest))
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    return deleted
+
+
+def score_deltas(db, student_criteria: list, days: int, limit: int = None) -> list:
+    """Change in each student's scores over the last `days` days.
+
+    The baseline is the student's earliest snapshot inside the window and the
+    end point is their current score. Students without a snapshot in the
+    window are included with null deltas. Ordered by LeetCode progress.
+    """
+    cutoff = _utcnow() - timedelta(days=days)
+    # Rank only these students' snapshots, not every user's in the window
+    students = select(Student.id).where(*student_criteria)
+    ranked = (
+        select(
+            ScoreSnapshot.student_id,
+            *(getattr(ScoreSnapshot, field) for field in SCRAPED_FIELDS),
+            func.row_number()
+            .over(partition_by=ScoreSnapshot.student_id, order_by=(ScoreSnapshot.taken_at, ScoreSnapshot.id))
+            .label("position"),
+        )
+        .where(ScoreSnapshot.student_id.in_(students), ScoreSnapshot.taken_at >= cutoff)
+        .subquery()
+    )
+    baseline = select(ranked).where(ranked.c.position == 1).subquery()
+
+    deltas = [
+        (getattr(Student, field) - baseline.c[field]).label(f"{field}_delta") for field in SCRAPED_FIELDS
+    ]
+    statement = (
+        select(Student.id, Student.name, Student.roll_number, *(getattr(Student, f) for f in SCRAPED_FIELDS), *deltas)
+        .outerjoin(baseline, baseline.c.student_id == Student.id)
+        .where(*student_criteria)
+        .order_by(func.coalesce(deltas[0], -1).desc(), Student.roll_number)
+    )
+    if limit is not None:
+        statement = statement.limit(limit)
+    return [dict(row._mapping) for row in db.execute(statement)]
+
+
+def weekly_scores(db, student_criteria: list, weeks: int) -> list:
+    """Per-week averages of the students' scores over the last `weeks` weeks.
+
+    Each student counts once per week, with their best score that week.
+    """
+    cutoff = _utcnow() - timedelta(weeks=weeks)
+    week = week_start(ScoreSnapshot.taken_at).label("week")
+    per_student = (
+        select(
+            ScoreSnapshot.student_id,
+            week,
+            *(func.max(getattr(ScoreSnapshot, field)).label(field) for field in SCRAPED_FIELDS),
+        )
+        .join(Student, Student.id == ScoreSnapshot.student_id)
+        .where(*student_criteria, ScoreSnapshot.taken_at >= cutoff)
+        .group_by(ScoreSnapshot.student_id, week)
+        .subquery()
+    )
+    statement = (
+        select(
+            per_student.c.week,
+            func.count().label("students"),
+            *(func.avg(per_student.c[field]).label(field) for field in SCRAPED_FIELDS),
+        )
+        .group_by(per_student.c.week)
+        .order_by(per_student.c.week)
+    )
+    return [
+        {
+            "week": row.week,
+            "students": row.students,
+            **{field: round(float(row[field]), 2) if row[field] is not None else None for field in SCRAPED_FIELDS},
+        }
+        for row in (r._mapping for r in db.execute(statement))
+    ]
+
+
+def main(argv) -> int:
+    if len(argv) < 2 or argv[1] != "prune":
+        print(__doc__)
+        return 1
+    db = SessionLocal()
+    try:
+        deleted = prune_snapshots(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Deleted {deleted} snapshot(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
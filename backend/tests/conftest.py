@@ -0,0 +1,92 @@
+"""Shared setup for the backend tests.
+
+The database engine is created on import, so DATABASE_URL is pointed at a
+throwaway SQLite file before any backend module is imported, unless it is
+already set. Tests run jobs themselves rather than through the job poller,
+and hash passwords at the lowest bcrypt cost.
+"""
+import io
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/tests.db")
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import scraper
+from benchmarks.fake_upstream import start_fake_upstream
+from benchmarks.server import ADMIN
+from circuit_breaker import CircuitBreaker
+from rate_limiter import AdaptiveRateLimiter
+from scrape_cache import ScrapeCache
+
+
+@pytest.fixture
+def upstream_server():
+    """A fake upstream; set error_rate etc. on its RequestHandlerClass to make it misbehave."""
+    server, _ = start_fake_upstream()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def upstream(monkeypatch, upstream_server):
+    """Point the scraper at a fake upstream and record what it asks for.
+
+    The scraper gets its own cache, rate limiter and circuit breaker, so tests
+    don't share state. Yields the list of (method, url, json body) requests.
+    """
+    base_url = f"http://127.0.0.1:{upstream_server.server_address[1]}"
+    monkeypatch.setattr(scraper, "LEETCODE_GRAPHQL_URL", f"{base_url}/graphql")
+    monkeypatch.setattr(scraper, "HACKERRANK_BASE_URL", base_url)
+    monkeypatch.setattr(scraper, "scrape_cache", ScrapeCache(db_path=""))
+    monkeypatch.setattr(scraper, "limiter", AdaptiveRateLimiter(initial_rate=1000, max_rate=1000))
+    monkeypatch.setattr(scraper, "breaker", CircuitBreaker())
+
+    requests = []
+    send = scraper.pools.request
+
+    def recording_request(method, url, **kwargs):
+        requests.append((method, url, kwargs.get("json")))
+        return send(method, url, **kwargs)
+
+    monkeypatch.setattr(scraper.pools, "request", recording_request)
+    return requests
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    token = client.post("/api/auth/login", json=ADMIN).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def roster_csv(rows) -> bytes:
+    """A roster CSV with the expected header; rows are (name, roll number, leetcode url, hackerrank url)."""
+    lines = ["Name,Roll Number,Leetcode Profile URL,HackerRank URL"]
+    lines.extend(",".join(row) for row in rows)
+    return ("\n".join(lines) + "\n").encode()
+
+
+@pytest.fixture
+def upload(client, admin_headers):
+    """Upload roster rows for the admin as CSV and return the response."""
+
+    def upload(category, rows, mode="merge", headers=admin_headers):
+        files = {"file": ("roster.csv", io.BytesIO(roster_csv(rows)))}
+        return client.post(f"/api/upload/{category}", params={"mode": mode}, files=files, headers=headers)
+
+    return upload
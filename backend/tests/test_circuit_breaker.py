@@ -0,0 +1,112 @@
+"""Circuit breaker state changes, and the scraper's use of it and of the negative cache."""
+from types import SimpleNamespace
+
+import pytest
+
+import circuit_breaker
+import scraper
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock for the breaker that only moves when advanced."""
+    clock = SimpleNamespace(now=1000.0)
+    clock.advance = lambda seconds: setattr(clock, "now", clock.now + seconds)
+    monkeypatch.setattr(circuit_breaker, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def fail(breaker, times):
+    for _ in range(times):
+        breaker.before_call("leetcode")
+        breaker.record_failure("leetcode")
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+
+    fail(breaker, 2)
+    breaker.before_call("leetcode")
+    breaker.record_success("leetcode")
+    fail(breaker, 2)
+    assert breaker.stats()["leetcode"]["state"] == "closed"
+
+    fail(breaker, 1)
+    with pytest.raises(CircuitOpenError) as rejected:
+        breaker.before_call("leetcode")
+    assert rejected.value.retry_in == 30
+    # Platforms have separate circuits
+    breaker.before_call("hackerrank")
+    assert breaker.stats()["leetcode"] == {
+        "state": "open",
+        "consecutive_failures": 3,
+        "times_opened": 1,
+        "rejected_calls": 1,
+        "retry_in_seconds": 30.0,
+    }
+
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, half_open_probes=1)
+    fail(breaker, 1)
+
+    clock.advance(30)
+    breaker.before_call("leetcode")
+    assert breaker.stats()["leetcode"]["state"] == "half_open"
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("leetcode")
+
+    breaker.record_success("leetcode")
+    assert breaker.stats()["leetcode"]["state"] == "closed"
+    breaker.before_call("leetcode")
+
+
+def test_failed_probe_doubles_the_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, max_reset_timeout=100)
+    fail(breaker, 1)
+
+    for expected in (60, 100):
+        clock.advance(breaker.stats()["leetcode"]["retry_in_seconds"])
+        fail(breaker, 1)
+        assert breaker.stats()["leetcode"]["retry_in_seconds"] == expected
+
+    clock.advance(99)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call("leetcode")
+    clock.advance(1)
+    breaker.before_call("leetcode")
+    breaker.record_success("leetcode")
+    # A closed circuit starts over from the configured timeout
+    fail(breaker, 1)
+    assert breaker.stats()["leetcode"]["retry_in_seconds"] == 30
+
+
+def test_open_circuit_stops_upstream_requests(monkeypatch, upstream, upstream_server):
+    upstream_server.RequestHandlerClass.error_rate = 1.0
+    monkeypatch.setattr(scraper, "MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(scraper, "breaker", CircuitBreaker(failure_threshold=2, reset_timeout=60))
+
+    badges = [scraper.fetch_hackerrank_badges(f"https://www.hackerrank.com/profile/hr{i}")[0] for i in range(5)]
+
+    assert badges == [None] * 5
+    assert len(upstream) == 2
+    assert scraper.breaker.stats()["hackerrank"]["rejected_calls"] == 3
+
+
+def test_missing_profiles_are_cached(upstream):
+    for _ in range(3):
+        assert scraper.fetch_hackerrank_badges("https://www.hackerrank.com/profile/missing-user")[0] is None
+        assert scraper.fetch_leetcode_solved("https://leetcode.com/u/missing-user/")[0] is None
+
+    assert len(upstream) == 2
+
+
+def test_failed_lookups_are_not_cached(upstream, upstream_server):
+    upstream_server.RequestHandlerClass.error_rate = 1.0
+    url = "https://www.hackerrank.com/profile/flaky"
+    assert scraper.fetch_hackerrank_badges(url)[0] is None
+
+    upstream_server.RequestHandlerClass.error_rate = 0.0
+    assert scraper.fetch_hackerrank_badges(url)[0] is not None
@@ -0,0 +1,103 @@
+"""Roster uploads: merging a re-upload into the existing roster, and replacing it."""
+import pytest
+
+from database import SessionLocal
+from models import Student
+
+CATEGORY = "1st_year"
+
+
+def row(name, roll_number, leetcode="", hackerrank=""):
+    return (
+        name,
+        roll_number,
+        f"https://leetcode.com/u/{leetcode}/" if leetcode else "",
+        f"https://www.hackerrank.com/profile/{hackerrank}" if hackerrank else "",
+    )
+
+
+def roster():
+    db = SessionLocal()
+    try:
+        return {(s.roll_number or s.name): s for s in db.query(Student).filter(Student.category == CATEGORY)}
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def scraped_roster(client, admin_headers, upload, upstream):
+    """Three scraped students, loaded with a replace upload."""
+    rows = [row("Ann", "A1", "ann", "ann"), row("Ben", "A2", "ben", "ben"), row("Cat", "A3", "cat", "cat")]
+    assert upload(CATEGORY, rows, mode="replace").json()["added"] == 3
+    assert client.post(f"/api/students/fetch/{CATEGORY}", headers=admin_headers).status_code == 200
+    return roster()
+
+
+def test_merge_keeps_unchanged_students(client, admin_headers, upload, scraped_roster):
+    rows = [
+        row("Ann", "A1", "ann", "ann"),
+        row("Ben", "A2", "ben-new", "ben"),
+        row("Dan", "A4", "dan", "dan"),
+        row("Dan again", "A4", "dan", "dan"),
+        row("Nora", "", "nora", "nora"),
+    ]
+
+    report = upload(CATEGORY, rows).json()
+
+    assert {key: report[key] for key in ("count", "added", "updated", "removed", "unchanged", "error_count")} == {
+        "count": 4,
+        "added": 2,
+        "updated": 1,
+        "removed": 1,
+        "unchanged": 1,
+        "error_count": 1,
+    }
+    assert report["errors"] == [{"row": 5, "error": "Duplicate roll number A4"}]
+
+    students = roster()
+    assert sorted(students) == ["A1", "A2", "A4", "Nora"]
+    ann, ben = students["A1"], students["A2"]
+    before_ann, before_ben = scraped_roster["A1"], scraped_roster["A2"]
+    assert (ann.id, ann.leetcode_solved, ann.hr_java_stars, ann.last_fetched) == (
+        before_ann.id,
+        before_ann.leetcode_solved,
+        before_ann.hr_java_stars,
+        before_ann.last_fetched,
+    )
+    # A changed LeetCode URL clears only the LeetCode count, and marks the student stale
+    assert ben.id == before_ben.id
+    assert ben.leetcode_solved is None
+    assert ben.hr_java_stars == before_ben.hr_java_stars
+    assert ben.last_fetched is None
+
+    stats = client.get(f"/api/stats/{CATEGORY}", headers=admin_headers).json()
+    assert (stats["count"], stats["fetched"]) == (4, 1)
+
+
+def test_students_without_roll_numbers_match_on_name(upload, scraped_roster):
+    rows = [row("Ann", "A1", "ann", "ann"), row("Nora", "", "nora", "nora")]
+    upload(CATEGORY, rows)
+    nora = roster()["Nora"]
+
+    report = upload(CATEGORY, rows).json()
+
+    assert (report["added"], report["unchanged"]) == (0, 2)
+    assert roster()["Nora"].id == nora.id
+
+
+def test_replace_reloads_the_roster(upload, scraped_roster):
+    report = upload(CATEGORY, [row("Ann", "A1", "ann", "ann")], mode="replace").json()
+
+    assert report["added"] == 1
+    ann = roster()["A1"]
+    assert ann.leetcode_solved is None
+    assert ann.last_fetched is None
+
+
+def test_rejects_unknown_modes_and_missing_columns(client, admin_headers, upload):
+    assert upload(CATEGORY, [], mode="append").status_code == 400
+
+    files = {"file": ("roster.csv", b"Student,LeetCode\nAnn,ann\n")}
+    response = client.post(f"/api/upload/{CATEGORY}", files=files, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Column 'name' not found")
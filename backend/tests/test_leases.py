@@ -0,0 +1,153 @@
+"""Leases, job claims, and scrape jobs that lose their lease part way through."""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+import jobs
+import leases
+from database import SessionLocal, engine
+from models import ScrapeJob, ScrapeJobItem, User
+
+CATEGORY = "4th_year"
+
+
+@pytest.fixture
+def db():
+    db = SessionLocal()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def admin_id(db):
+    return db.query(User.id).filter(User.username == "Admin@AI").scalar()
+
+
+@pytest.fixture
+def roster(upload, upstream):
+    rows = [(f"S{i}", f"R{i}", f"https://leetcode.com/u/lc{i}/", f"https://www.hackerrank.com/profile/hr{i}") for i in range(5)]
+    assert upload(CATEGORY, rows, mode="replace").status_code == 200
+
+
+def expire_claim(job_id):
+    with engine.begin() as conn:
+        conn.execute(
+            update(ScrapeJob).where(ScrapeJob.id == job_id).values(lease_expires_at=leases.utcnow() - timedelta(seconds=1))
+        )
+
+
+def test_lease_excludes_other_holders():
+    a, b = leases.new_token(), leases.new_token()
+
+    assert leases.acquire("test:exclusive", a)
+    assert leases.acquire("test:exclusive", a)
+    assert not leases.acquire("test:exclusive", b)
+    # Only the holder can release or renew it
+    leases.release("test:exclusive", b)
+    assert not leases.renew("test:exclusive", b)
+    assert leases.renew("test:exclusive", a)
+
+    leases.release("test:exclusive", a)
+    assert leases.acquire("test:exclusive", b)
+    leases.release("test:exclusive", b)
+
+
+def test_expired_lease_can_be_taken():
+    a, b = leases.new_token(), leases.new_token()
+    assert leases.acquire("test:expired", a, seconds=-1)
+
+    assert leases.acquire("test:expired", b)
+    assert not leases.renew("test:expired", a)
+    leases.release("test:expired", b)
+
+
+def test_holding_raises_when_busy():
+    with leases.holding("test:holding"):
+        with pytest.raises(leases.LeaseBusy):
+            with leases.holding("test:holding"):
+                pass
+    with leases.holding("test:holding"):
+        pass
+
+
+def test_heartbeat_notices_a_lost_lease(monkeypatch):
+    monkeypatch.setattr(leases, "LEASE_SECONDS", 0.03)
+    heartbeat = leases.Heartbeat(lambda: False).start()
+    try:
+        assert heartbeat.lost.wait(1)
+        with pytest.raises(leases.LeaseLost):
+            heartbeat.check()
+    finally:
+        heartbeat.stop()
+
+
+def test_sync_fetch_refuses_while_a_job_holds_the_category(client, admin_headers, admin_id, roster):
+    with leases.holding(leases.fetch_lease_name(admin_id, CATEGORY)):
+        response = client.post(f"/api/students/fetch/{CATEGORY}", headers=admin_headers)
+    assert response.status_code == 409
+    assert client.post(f"/api/students/fetch/{CATEGORY}", headers=admin_headers).status_code == 200
+
+
+def test_a_job_has_one_claimant(db, admin_id):
+    job = jobs.create_job(db, admin_id, CATEGORY, 0)
+    a, b = leases.new_token(), leases.new_token()
+
+    assert jobs.claim_job(job.id, a)
+    assert not jobs.claim_job(job.id, b)
+    assert jobs.claim_next_job(b) != job.id
+    assert jobs.renew_claim(job.id, a)
+    assert not jobs.renew_claim(job.id, b)
+
+    # A lapsed claim can be taken over, and the old holder can't renew it
+    expire_claim(job.id)
+    assert jobs.claim_job(job.id, b)
+    assert not jobs.renew_claim(job.id, a)
+
+    # A released claim can be taken straight away
+    jobs.release_claim(job.id, a)
+    assert not jobs.claim_job(job.id, a)
+    jobs.release_claim(job.id, b)
+    assert jobs.claim_job(job.id, a)
+
+    db.query(ScrapeJob).filter(ScrapeJob.id == job.id).update({"status": "completed"})
+    db.commit()
+    expire_claim(job.id)
+    assert not jobs.claim_job(job.id, b)
+
+
+def test_job_that_loses_its_lease_is_resumed(db, admin_id, roster, monkeypatch):
+    monkeypatch.setattr(jobs, "SNAPSHOT_BATCH_SIZE", 2)
+    job = jobs.create_job(db, admin_id, CATEGORY, 5)
+    holder = leases.new_token()
+    assert jobs.claim_job(job.id, holder)
+
+    # Lose the lease once the first batch of two students is committed:
+    # two result checks and one batch check pass, the next check fails
+    checks = []
+    check = leases.Heartbeat.check
+
+    def losing_check(heartbeat):
+        checks.append(1)
+        if len(checks) > 3:
+            heartbeat.lost.set()
+        return check(heartbeat)
+
+    monkeypatch.setattr(leases.Heartbeat, "check", losing_check)
+    jobs.run_job(job.id, holder)
+
+    db.refresh(job)
+    assert (job.status, job.claimed_by, job.completed) == ("running", None, 2)
+    assert db.query(ScrapeJobItem).filter(ScrapeJobItem.job_id == job.id).count() == 2
+    assert leases.acquire(leases.fetch_lease_name(admin_id, CATEGORY), holder)
+    leases.release(leases.fetch_lease_name(admin_id, CATEGORY), holder)
+
+    monkeypatch.setattr(leases.Heartbeat, "check", check)
+    holder = leases.new_token()
+    assert jobs.claim_next_job(holder) == job.id
+    jobs.run_job(job.id, holder)
+
+    db.refresh(job)
+    assert (job.status, job.completed, job.failed, job.total) == ("completed", 5, 0, 5)
+    items = db.query(ScrapeJobItem.student_id).filter(ScrapeJobItem.job_id == job.id).all()
+    assert len(items) == len(set(items)) == 5
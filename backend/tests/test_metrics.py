@@ -0,0 +1,76 @@
+"""/api/metrics access control and the series a scrape records."""
+import re
+
+import pytest
+
+import main
+
+
+def sample(text: str, series: str) -> float:
+    """The value of one series line, e.g. 'scraper_lookups_total{platform="leetcode",outcome="ok"}'; 0 if absent."""
+    match = re.search(rf"^{re.escape(series)} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+@pytest.fixture
+def user_headers(client, admin_headers):
+    client.post("/api/auth/create-account", json={"username": "metrics-user", "password": "secret"}, headers=admin_headers)
+    token = client.post("/api/auth/login", json={"username": "metrics-user", "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_metrics_require_credentials(client):
+    assert client.get("/api/metrics").status_code == 401
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer nonsense"}).status_code == 401
+
+
+def test_metrics_require_an_admin(client, user_headers):
+    assert client.get("/api/metrics", headers=user_headers).status_code == 403
+
+
+def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-me")
+
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer scrape-me"}).status_code == 200
+    assert client.get("/api/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+
+
+def test_scrape_records_lookup_and_request_series(client, admin_headers, upload, upstream):
+    rows = [
+        ("Ada", "M1", "https://leetcode.com/u/ada/", "https://www.hackerrank.com/profile/ada"),
+        ("Ghost", "M2", "https://leetcode.com/u/missing-ghost/", "https://www.hackerrank.com/profile/missing-ghost"),
+    ]
+    assert upload("3rd_year", rows).status_code == 200
+    series = {
+        "leetcode_ok": 'scraper_lookups_total{platform="leetcode",outcome="ok"}',
+        "leetcode_not_found": 'scraper_lookups_total{platform="leetcode",outcome="not_found"}',
+        "hackerrank_ok": 'scraper_lookups_total{platform="hackerrank",outcome="ok"}',
+        "hackerrank_not_found": 'scraper_lookups_total{platform="hackerrank",outcome="not_found"}',
+        "leetcode_requests": 'upstream_request_duration_seconds_count{platform="leetcode",status="200"}',
+        "hackerrank_404s": 'upstream_request_duration_seconds_count{platform="hackerrank",status="404"}',
+        "fetch_requests": (
+            'http_request_duration_seconds_count{method="POST",route="/api/students/fetch/{category}",status="200"}'
+        ),
+    }
+    before = client.get("/api/metrics", headers=admin_headers).text
+
+    assert client.post("/api/students/fetch/3rd_year", headers=admin_headers).status_code == 200
+
+    response = client.get("/api/metrics", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = response.text
+    increase = {name: sample(after, line) - sample(before, line) for name, line in series.items()}
+    assert increase == {
+        "leetcode_ok": 1,
+        "leetcode_not_found": 1,
+        "hackerrank_ok": 1,
+        "hackerrank_not_found": 1,
+        # Both LeetCode users go in one batched query
+        "leetcode_requests": 1,
+        "hackerrank_404s": 1,
+        "fetch_requests": 1,
+    }
+    # Request series are labelled by route template, never by the concrete path
+    assert 'route="/api/students/fetch/3rd_year"' not in after
+    assert 'http_request_duration_seconds_bucket{method="POST",route="/api/students/fetch/{category}",status="200",le="+Inf"}' in after
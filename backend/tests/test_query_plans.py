@@ -0,0 +1,54 @@
+"""The student queries must be served by indexes on a freshly migrated schema.
+
+Runs against a throwaway SQLite database unless DATABASE_URL is set, e.g. to
+a scratch PostgreSQL database:
+
+    cd backend && python -m pytest -q tests
+"""
+import pytest
+from sqlalchemy import text
+
+from database import SessionLocal, engine
+from migrations import upgrade
+from query_plans import explain, is_sequential_scan, plan_queries
+
+
+@pytest.fixture(scope="module")
+def conn():
+    upgrade()
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            # An empty table makes the planner prefer seq scans; only index use matters
+            conn.execute(text("SET enable_seqscan = off"))
+        yield conn
+
+
+def statements():
+    db = SessionLocal()
+    try:
+        return [pytest.param(statement, id=name) for name, statement in plan_queries(db).items()]
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("statement", statements())
+def test_uses_an_index(conn, statement):
+    plan = explain(conn, statement)
+    assert not is_sequential_scan(plan), "\n".join(plan)
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="SQLite plan wording")
+@pytest.mark.parametrize(
+    "line, scans",
+    [
+        ("SCAN students", True),
+        ("SCAN TABLE students", True),
+        ("SCAN TABLE students USING INDEX ix_students_owner_category_roll", True),
+        ("SEARCH students USING INDEX ix_students_owner_category_roll (uploaded_by=? AND category=?)", False),
+        ("SEARCH TABLE students USING INDEX ix_students_owner_category_roll (uploaded_by=? AND category=?)", False),
+        ("SCAN score_snapshots", False),
+        ("SCAN students_archive", False),
+    ],
+)
+def test_sequential_scan_wording(line, scans):
+    assert is_sequential_scan([line]) is scans
@@ -0,0 +1,86 @@
+"""The per-host adaptive rate limiter, and the scraper's retries through it."""
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limiter
+import scraper
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock for the limiter that sleeping advances instantly."""
+    clock = SimpleNamespace(now=1000.0, slept=0.0)
+
+    def sleep(seconds):
+        clock.now += seconds
+        clock.slept += seconds
+
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+    return clock
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7
+    assert parse_retry_after("-3") == 0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    in_a_minute = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 58 <= parse_retry_after(in_a_minute) <= 60
+
+
+def test_acquire_spaces_requests_at_the_rate(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=4, increase=0)
+
+    for _ in range(5):
+        limiter.acquire("example.com")
+
+    # The first request uses the bucket's initial token, the rest wait 1/rate each
+    assert clock.slept == pytest.approx(1.0)
+    assert limiter.stats()["example.com"]["requests"] == 5
+
+
+def test_rate_increases_additively_and_decreases_multiplicatively(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=4, min_rate=1, max_rate=5, increase=0.5, decrease=0.5)
+
+    for _ in range(3):
+        limiter.record("example.com", 200)
+    assert limiter.stats()["example.com"]["rate_per_second"] == 5
+
+    limiter.record("example.com", 503)
+    limiter.record("example.com", 429)
+    limiter.record("example.com", None)
+    stats = limiter.stats()["example.com"]
+    assert stats["rate_per_second"] == 1
+    assert (stats["server_errors"], stats["throttled"], stats["connection_errors"], stats["backoffs"]) == (1, 1, 1, 3)
+    # Hosts are limited separately
+    assert "other.example.com" not in limiter.stats()
+
+
+def test_retry_after_pauses_the_host(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "MAX_RETRY_AFTER", 60)
+    limiter = AdaptiveRateLimiter(initial_rate=10)
+
+    limiter.record("example.com", 429, "30")
+    assert limiter.stats()["example.com"]["blocked_for_seconds"] == 30
+    limiter.acquire("example.com")
+    assert clock.slept >= 30
+
+    limiter.record("example.com", 429, "3600")
+    assert limiter.stats()["example.com"]["blocked_for_seconds"] == 60
+
+
+def test_throttled_requests_are_retried(monkeypatch, upstream, upstream_server):
+    upstream_server.RequestHandlerClass.throttle_rate = 1.0
+    upstream_server.RequestHandlerClass.retry_after = 0
+    monkeypatch.setattr(scraper, "MAX_ATTEMPTS", 3)
+
+    assert scraper.fetch_hackerrank_badges("https://www.hackerrank.com/profile/busy")[0] is None
+
+    assert len(upstream) == 3
+    stats = scraper.limiter.stats()[upstream[0][1].split("/")[2]]
+    assert stats["throttled"] == 3
+    assert stats["rate_per_second"] == 125
@@ -0,0 +1,96 @@
+"""scrape_students_async against the fake upstream in benchmarks/fake_upstream.py."""
+import asyncio
+
+from benchmarks.fake_upstream import badge_stars, solved_count
+from scraper import ScrapeBudget, scrape_students_async
+
+
+def leetcode_url(username):
+    return f"https://leetcode.com/u/{username}/"
+
+
+def hackerrank_url(username):
+    return f"https://www.hackerrank.com/profile/{username}"
+
+
+def expected(leetcode_username, hackerrank_username):
+    stars = {badge["badge_name"].lower(): badge["stars"] for badge in badge_stars(hackerrank_username)}
+    return {
+        "leetcode_solved": solved_count(leetcode_username),
+        "hr_java_stars": stars["java"],
+        "hr_python_stars": stars["python"],
+        "hr_c_stars": stars["c"],
+        "hr_sql_stars": stars["sql"],
+    }
+
+
+def scores(scraped):
+    return {key: value for key, value in scraped.items() if key != "fetched_at"}
+
+
+def scrape(students, **options):
+    return asyncio.run(scrape_students_async(students, **options))
+
+
+def requested_leetcode(requests):
+    return [name for _, _, body in requests if body for name in body["variables"].values()]
+
+
+def requested_hackerrank(requests):
+    return [url for method, url, _ in requests if method == "GET"]
+
+
+def test_results_follow_input_order(upstream):
+    students = [(leetcode_url(f"lc{i}"), hackerrank_url(f"hr{i}")) for i in range(25)]
+    reported = {}
+
+    results = scrape(students, on_result=lambda index, scraped: reported.setdefault(index, scraped))
+
+    assert [scores(r) for r in results] == [expected(f"lc{i}", f"hr{i}") for i in range(25)]
+    assert reported == dict(enumerate(results))
+
+
+def test_missing_profiles_are_none(upstream):
+    results = scrape([(leetcode_url("missing1"), hackerrank_url("missing2"))])
+
+    assert scores(results[0]) == {
+        "leetcode_solved": None,
+        "hr_java_stars": None,
+        "hr_python_stars": None,
+        "hr_c_stars": None,
+        "hr_sql_stars": None,
+    }
+
+
+def test_duplicate_handles_are_looked_up_once(upstream):
+    students = [
+        (leetcode_url("alice"), hackerrank_url("Bob")),
+        ("leetcode.com/u/alice", hackerrank_url("bob")),
+        (leetcode_url(" @alice"), "https://www.hackerrank.com/@BOB/"),
+        (leetcode_url("carol"), hackerrank_url("dave")),
+    ]
+
+    results = scrape(students)
+
+    assert sorted(requested_leetcode(upstream)) == ["alice", "carol"]
+    assert sorted(url.split("/")[-2] for url in requested_hackerrank(upstream)) == ["bob", "dave"]
+    assert [scores(r) for r in results] == [expected("alice", "bob")] * 3 + [expected("carol", "dave")]
+
+
+def test_request_budget_stops_the_run(upstream):
+    students = [(leetcode_url(f"lc{i}"), hackerrank_url(f"hr{i}")) for i in range(10)]
+    budget = ScrapeBudget(max_requests=2)
+
+    results = scrape(students, budget=budget)
+
+    # The first student's LeetCode batch and HackerRank lookup use up the budget
+    assert scores(results[0]) == expected("lc0", "hr0")
+    assert results[1:] == [None] * 9
+    assert len(upstream) == 2
+
+
+def test_spent_time_budget_scrapes_nothing(upstream):
+    students = [(leetcode_url(f"lc{i}"), hackerrank_url(f"hr{i}")) for i in range(5)]
+
+    assert scrape(students, budget=ScrapeBudget(seconds=0)) == [None] * 5
+    assert upstream == []
@@ -0,0 +1,69 @@
+"""Scrape worker that runs refresh jobs claimed from the scrape_jobs table.
+
+Run any number of these next to the API, on one host or many:
+
+    python worker.py
+
+Each worker claims the oldest queued job, or one whose previous worker
+stopped renewing its claim, and runs it on one of WORKER_THREADS threads.
+Jobs for the same user and category never run at once, because each job
+holds that category's lease (see leases.py). Set JOB_WORKERS=0 on the API
+processes to leave all scraping to the workers. With SCHEDULER_ENABLED=1 a
+worker also runs the refresh scheduler; only one process at a time holds
+the scheduler lease and schedules rounds.
+"""
+import os
+import signal
+import threading
+
+import jobs
+import leases
+import migrations
+import scheduler
+from http_pool import pools
+
+
+# Jobs this worker runs at the same time
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "2"))
+# Seconds an idle worker thread waits before looking for new jobs
+WORKER_POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "2"))
+
+
+def work(stop: threading.Event):
+    while not stop.is_set():
+        holder = leases.new_token()
+        job_id = jobs.claim_next_job(holder)
+        if job_id is None:
+            stop.wait(WORKER_POLL_INTERVAL)
+            continue
+        jobs.run_job(job_id, holder)
+
+
+def main():
+    migrations.check_schema()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+
+    threads = [
+        threading.Thread(target=work, args=(stop,), name=f"worker-{i}", daemon=True)
+        for i in range(WORKER_THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    if scheduler.SCHEDULER_ENABLED:
+        scheduler.start()
+    print(f"Worker running {WORKER_THREADS} job thread(s)")
+
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        stop.set()
+    scheduler.stop()
+    # Job threads die with the process; their claims lapse and another
+    # worker resumes the jobs where they left off
+    pools.close()
+
+
+if __name__ == "__main__":
+    main()
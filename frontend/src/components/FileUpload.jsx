@@ -13,8 +13,8 @@ export default function FileUpload({ category, onSuccess }) {
 
     const handleFile = async (file) => {
         if (!file) return;
-        if (!file.name.match(/\.(xlsx|xls)$/i)) {
-            setError('Please upload an Excel file (.xlsx or .xls)');
+        if (!file.name.match(/\.(xlsx|xls|csv|parquet)$/i)) {
+            setError('Please upload an Excel, CSV or Parquet file (.xlsx, .xls, .csv, .parquet)');
             return;
         }
 
@@ -35,7 +35,9 @@ export default function FileUpload({ category, onSuccess }) {
             const data = await res.json();
             if (!res.ok) throw new Error(data.detail || 'Upload failed');
 
-            setSuccess(data.message);
+            setSuccess(data.error_count
+                ? `${data.message} (${data.error_count} rows skipped, first at row ${data.errors[0].row}: ${data.errors[0].error})`
+                : data.message);
             if (onSuccess) onSuccess(data);
         } catch (err) {
             setError(err.message);
@@ -66,7 +68,7 @@ export default function FileUpload({ category, onSuccess }) {
                 <input
                     type="file"
                     ref={fileRef}
-                    accept=".xlsx,.xls"
+                    accept=".xlsx,.xls,.csv,.parquet"
                     style={{ display: 'none' }}
                     onChange={(e) => handleFile(e.target.files[0])}
                 />
@@ -79,8 +81,8 @@ export default function FileUpload({ category, onSuccess }) {
                 ) : (
                     <>
                         <div className="upload-icon">📁</div>
-                        <h3>Upload {categoryLabel} Excel Sheet</h3>
-                        <p>Drag & drop your Excel file here, or click to browse</p>
+                        <h3>Upload {categoryLabel} Roster</h3>
+                        <p>Drag & drop your Excel, CSV or Parquet file here, or click to browse</p>
                         <p style={{ marginTop: '0.5rem', fontSize: '0.75rem', color: 'var(--text-muted)' }}>
                             Required columns: Name, Roll Number, Leetcode Profile URL, HackerRank URL
                         </p>
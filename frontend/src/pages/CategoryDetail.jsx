@@ -41,27 +41,42 @@ export default function CategoryDetail() {
         if (!window.confirm(`Fetching data from LeetCode and HackerRank for all ${students.length} students might take several minutes. Proceed?`)) return;
 
         setFetchLoading(true);
-        setProgress({ current: 0, total: students.length, studentName: students[0].name });
+        setProgress({ current: 0, total: students.length, studentName: 'Queuing refresh...' });
 
         try {
-            const updatedStudents = [...students];
-
-            for (let i = 0; i < students.length; i++) {
-                const student = students[i];
-                setProgress(prev => ({ ...prev, current: i, studentName: student.name }));
-
-                const res = await fetch(`${API_URL}/students/fetch-single/${student.id}`, {
-                    method: 'POST',
+            const res = await fetch(`${API_URL}/jobs/fetch/${category}`, {
+                method: 'POST',
+                headers: { Authorization: `Bearer ${token}` },
+            });
+            if (!res.ok) throw new Error('Failed to start refresh');
+            const { job_id } = await res.json();
+
+            // Poll the background job, merging each finished student into the table
+            let after = 0;
+            let job;
+            do {
+                await new Promise(resolve => setTimeout(resolve, 1500));
+                const pollRes = await fetch(`${API_URL}/jobs/${job_id}?after=${after}`, {
                     headers: { Authorization: `Bearer ${token}` },
                 });
+                if (!pollRes.ok) throw new Error('Failed to read refresh progress');
+                job = await pollRes.json();
 
-                if (res.ok) {
-                    const updated = await res.json();
-                    updatedStudents[i] = updated;
-                    setStudents([...updatedStudents]);
+                if (job.results.length) {
+                    after = job.results[job.results.length - 1].item_id;
+                    const updates = new Map(job.results.map(r => [r.student_id, r.student]));
+                    setStudents(prev => prev.map(s => updates.get(s.id) || s));
                 }
-            }
-            setProgress(prev => ({ ...prev, current: students.length, studentName: 'Completed!' }));
+                const last = job.results[job.results.length - 1];
+                setProgress(prev => ({
+                    current: job.completed + job.failed,
+                    total: job.total,
+                    studentName: last && last.student ? last.student.name : prev.studentName,
+                }));
+            } while (job.status === 'queued' || job.status === 'running');
+
+            if (job.status === 'failed') throw new Error(job.error || 'Refresh failed');
+            setProgress(prev => ({ ...prev, current: prev.total, studentName: 'Completed!' }));
             setTimeout(() => setFetchLoading(false), 1500);
         } catch (err) {
             alert('Error fetching data: ' + err.message);